@@ -19,32 +19,41 @@ try:
 except ModuleNotFoundError:
     import tomli as tomllib
 
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from job_queue_analyzer import JobQueueAnalyzer
 
 
+CONFIG_PATH = Path.home() / '.config' / 'cluster_monitor' / 'config.toml'
+
+
+@functools.lru_cache(maxsize=1)
+def _parse_config(mtime_ns: int) -> dict:
+    """Parse the TOML config, cached until the file's mtime changes"""
+    with open(CONFIG_PATH, 'rb') as f:
+        return tomllib.load(f)
+
+
 def load_config() -> dict:
     """Load cluster configuration"""
-    config_path = Path.home() / '.config' / 'cluster_monitor' / 'config.toml'
-    
-    if not config_path.exists():
-        print(f"Configuration not found: {config_path}")
+    try:
+        mtime_ns = CONFIG_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        print(f"Configuration not found: {CONFIG_PATH}")
         print("Run cluster_node_monitor.py first to create configuration")
         sys.exit(1)
     
-    with open(config_path, 'rb') as f:
-        return tomllib.load(f)
+    return _parse_config(mtime_ns)
 
 
 def get_clusters(config: dict) -> List[str]:
     """Get list of cluster names from config"""
-    clusters = []
-    for section_name, section_data in config.items():
-        # A cluster section must have 'user' and 'head_node' keys
-        if isinstance(section_data, dict):
-            if 'user' in section_data and 'head_node' in section_data:
-                clusters.append(section_name)
-    return clusters
+    # A cluster section must have 'user' and 'head_node' keys
+    return [
+        name for name, section in config.items()
+        if isinstance(section, dict) and 'user' in section and 'head_node' in section
+    ]
 
 
 def main():
@@ -83,19 +92,33 @@ def main():
     
     total_misleading = 0
     
-    for cluster_name in clusters_to_check:
-        cluster_config = config[cluster_name]
+    # Each analysis is dominated by SSH round trips, so query all clusters
+    # at once and print the outcomes afterwards in configuration order
+    outcomes = {}
+    with ThreadPoolExecutor(max_workers=min(16, len(clusters_to_check))) as executor:
+        futures = {}
+        for cluster_name in clusters_to_check:
+            cluster_config = config[cluster_name]
+            analyzer = JobQueueAnalyzer(
+                cluster=cluster_name,
+                user=cluster_config['user'],
+                head_node=cluster_config['head_node']
+            )
+            futures[executor.submit(analyzer.analyze_queue)] = cluster_name
         
+        for future in as_completed(futures):
+            try:
+                outcomes[futures[future]] = future.result()
+            except Exception as e:
+                outcomes[futures[future]] = e
+    
+    for cluster_name in clusters_to_check:
         print(f"Checking {cluster_name}...")
         
-        analyzer = JobQueueAnalyzer(
-            cluster=cluster_name,
-            user=cluster_config['user'],
-            head_node=cluster_config['head_node']
-        )
-        
         try:
-            results = analyzer.analyze_queue()
+            results = outcomes[cluster_name]
+            if isinstance(results, Exception):
+                raise results
             
             if results:
                 print(f"\nFound {len(results)} misleading status messages:\n")
@@ -103,8 +126,8 @@ def main():
                 
                 for result in results:
                     job = result['job']
-                    print(f"  Job {job['jobid']} - {job['name']} ({job['user']})")
-                    print(f"    Status says: {job['reason']}")
+                    print(f"  Job {job.jobid} - {job.name} ({job.user})")
+                    print(f"    Status says: {job.reason}")
                     print(f"    Reality: {result['real_reason']}")
                     
                     if args.verbose:
@@ -7,9 +7,14 @@ Handles all database operations for cluster node monitoring
 import typing
 from typing import *
 
+import atexit
+import contextlib
 import datetime
+import functools
 import os
+import sqlite3
 import sys
+import time
 from pathlib import Path
 
 ###
@@ -18,9 +23,161 @@ from pathlib import Path
 from urdb import URdb
 
 
+# Milliseconds since the epoch, computed inside SQLite from an ISO string
+# (or 'now'); ISO timestamps written by this package are local time
+TS_MS_SQL = "CAST(ROUND((julianday({}) - 2440587.5) * 86400000) AS INTEGER)"
+
+# Defaulted so rows inserted by other writers of the same database still
+# get a value
+TS_MS_COLUMN = f"ts_ms INTEGER NOT NULL DEFAULT ({TS_MS_SQL.format(repr('now'))})"
+
+# node_status_hourly counts each node's checks per bucket of this many ms
+HOURLY_BUCKET_MS = 3_600_000
+
+# INSERT ... RETURNING needs SQLite 3.35+
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35)
+
+
+def _now() -> Tuple[str, int]:
+    """
+    Read the clock once for a new row
+    
+    Returns:
+        Tuple of (ISO local timestamp, epoch milliseconds)
+    """
+    now = time.time()
+    return datetime.datetime.fromtimestamp(now).isoformat(), int(now * 1000)
+
+
+def _cutoff_ms(days: int) -> int:
+    """Epoch milliseconds for the start of a look-back window of N days"""
+    return int((time.time() - days * 86400) * 1000)
+
+
+@functools.lru_cache(maxsize=None)
+def _sql(template: str, conditions: Tuple[str, ...]) -> str:
+    """
+    Fill the {where} slot of a query template with AND-ed conditions
+    (or a match-all 1 when there are none)
+    
+    Memoized per (template, filter combination), so each get_* call reuses
+    the same SQL text instead of formatting a new one.
+    
+    Args:
+        template: Query text containing a single {where} placeholder
+        conditions: WHERE clause terms for the active filters
+        
+    Returns:
+        Complete query text
+    """
+    return template.format(where=' AND '.join(conditions) or '1')
+
+
+def _pack_availability(flags: Iterable[bool]) -> bytes:
+    """
+    Pack availability flags one bit per node, first node in the lowest bit
+    
+    Args:
+        flags: Availability of each node, in snapshot node order
+        
+    Returns:
+        Little-endian bitmap of ceil(len(flags) / 8) bytes
+    """
+    bits = 0
+    count = 0
+    for count, flag in enumerate(flags, 1):
+        if flag:
+            bits |= 1 << (count - 1)
+    return bits.to_bytes((count + 7) // 8, 'little')
+
+
+def _popcount(bitmap: Optional[bytes]) -> Optional[int]:
+    """SQL function popcount(blob): number of set bits in a bitmap"""
+    if bitmap is None:
+        return None
+    return int.from_bytes(bitmap, 'little').bit_count()
+
+
 class ClusterMonitorDB:
     """Database operations for cluster monitoring"""
     
+    # Writer tuning: WAL lets the get_* readers run alongside the
+    # log_* writers, and synchronous=NORMAL avoids an fsync per commit
+    WRITER_PRAGMAS = (
+        # Only takes effect on a new, empty database (before any table exists)
+        "PRAGMA auto_vacuum=INCREMENTAL",
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA wal_autocheckpoint=1000",
+    )
+    
+    # Per-connection tuning, applied to both the writer and the reader
+    PRAGMAS = (
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA cache_size=-20000",
+        "PRAGMA temp_store=memory",
+        "PRAGMA mmap_size=268435456",
+    )
+    
+    # Hot INSERTs kept as single constants so every call hands sqlite3 the
+    # identical SQL text and hits its per-connection prepared-statement cache
+    INSERT_NODE_STATUS = """
+        INSERT INTO node_status 
+        (timestamp, ts_ms, cluster, node_name, status, slurm_state, is_available, checked_from)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    INSERT_NODE_EVENT = """
+        INSERT INTO node_events 
+        (timestamp, ts_ms, cluster, node_name, event_type, details, severity)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    INSERT_RECOVERY_ATTEMPT = """
+        INSERT INTO recovery_attempts 
+        (timestamp, ts_ms, cluster, node_name, command, exit_code, output, success)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    # One row per node, replaced on every status write, so "latest status"
+    # reads never have to scan node_status history
+    UPSERT_NODE_STATUS_LATEST = """
+        INSERT OR REPLACE INTO node_status_latest 
+        (cluster, node_name, slurm_state, is_available, timestamp, ts_ms)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    
+    # Counts one check of a node in its hourly bucket, as
+    # cluster_node_monitor.py does: (cluster, node_name, bucket_ms, 1 if down)
+    UPSERT_NODE_STATUS_HOURLY = """
+        INSERT INTO node_status_hourly 
+        (cluster, node_name, bucket_ms, checks, down_checks)
+        VALUES (?, ?, ?, 1, ?)
+        ON CONFLICT (cluster, node_name, bucket_ms) DO UPDATE SET
+            checks = checks + 1,
+            down_checks = down_checks + excluded.down_checks
+    """
+    
+    # One row per batch check of a cluster: node names in check order and a
+    # bitmap with one availability bit per node (see _pack_availability)
+    INSERT_NODE_STATUS_SNAPSHOT = """
+        INSERT OR REPLACE INTO node_status_snapshot 
+        (cluster, timestamp, ts_ms, node_names, node_count, availability_bitmap)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    
+    # Exact row counts kept up to date by the log_* and cleanup paths, so
+    # get_database_stats never has to COUNT(*) a history table
+    UPDATE_ROW_COUNT = "UPDATE row_counts SET n = n + ? WHERE table_name = ?"
+    
+    TABLES = ('node_status', 'node_events', 'recovery_attempts', 'node_status_snapshot')
+    
+    # Rows deleted per transaction by cleanup_old_records
+    CLEANUP_BATCH_SIZE = 5000
+    
+    # Rows fetched per step when streaming query results
+    STREAM_ARRAYSIZE = 1000
+    
     def __init__(self, db_path: Path):
         """
         Initialize database connection
@@ -29,7 +186,101 @@ class ClusterMonitorDB:
             db_path: Path to SQLite database file
         """
         self.db_path = db_path
+        
+        # Writer: log_*, cleanup_old_records and init_schema
         self.db = URdb(str(db_path))
+        for pragma in self.WRITER_PRAGMAS + self.PRAGMAS:
+            self.db.execute(pragma)
+        
+        # 'wal' for file databases; in-memory databases report 'memory'
+        self.journal_mode = self.db.execute("PRAGMA journal_mode").fetchone()[0]
+        
+        # Reader: all get_* queries, so a long report never holds up a write.
+        # It opens the file with mode=ro, after the writer has created it.
+        # An in-memory database is private to its connection, so share it.
+        if str(db_path) == ':memory:':
+            self.db_ro = self.db
+        else:
+            self.db_ro = URdb(str(db_path), read_only=True)
+            for pragma in self.PRAGMAS:
+                self.db_ro.execute(pragma)
+        
+        for db in (self.db, self.db_ro):
+            db.connection.create_function("popcount", 1, _popcount, deterministic=True)
+        
+        atexit.register(self.close)
+    
+    def close(self) -> None:
+        """
+        Refresh planner statistics and close both connections
+        
+        Safe to call more than once; also runs at interpreter exit.
+        """
+        if self.db.connection is None:
+            return
+        
+        atexit.unregister(self.close)
+        
+        # Cheap on a quiet database: only analyzes tables whose
+        # statistics have drifted since the last run
+        self.db.connection.execute("PRAGMA optimize")
+        
+        if self.db_ro is not self.db:
+            self.db_ro.close()
+        self.db.close()
+    
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run a block of writes as a single BEGIN IMMEDIATE ... COMMIT
+        
+        Taking the write lock up front avoids SQLITE_BUSY on a
+        read-to-write lock upgrade halfway through the block.
+        
+        Yields:
+            The underlying sqlite3 connection
+        """
+        with self.db.transaction():
+            yield self.db.connection
+    
+    def _insert(self, conn: sqlite3.Connection, sql: str, params: tuple) -> int:
+        """
+        Run a single-row INSERT and return the new row's id
+        
+        Args:
+            conn: Connection inside an open transaction
+            sql: INSERT statement without a RETURNING clause
+            params: Statement parameters
+            
+        Returns:
+            Row ID of inserted record
+        """
+        if HAS_RETURNING:
+            return conn.execute(f"{sql} RETURNING id", params).fetchone()[0]
+        return conn.execute(sql, params).lastrowid
+    
+    def _stream(self, query: str, params: tuple) -> Iterator[tuple]:
+        """
+        Yield rows of a read query from a private cursor on the reader
+        connection, so concurrent generators don't share URdb's cursor
+        
+        Args:
+            query: SQL query string
+            params: Query parameters
+            
+        Returns:
+            Iterator over result tuples
+        """
+        cursor = self.db_ro.connection.cursor()
+        cursor.arraysize = self.STREAM_ARRAYSIZE
+        try:
+            cursor.execute(query, params)
+            while rows := cursor.fetchmany():
+                yield from rows
+        except sqlite3.Error as e:
+            raise Exception(f"Query execution error: {e}\nQuery: {query}")
+        finally:
+            cursor.close()
     
     def init_schema(self, schema_file: Optional[Path] = None) -> None:
         """
@@ -38,40 +289,85 @@ class ClusterMonitorDB:
         Args:
             schema_file: Optional path to SQL schema file
         """
+        self._migrate_ts_ms()
+        
         if schema_file and schema_file.exists():
             # Load from schema file
             with open(schema_file, 'r') as f:
                 sql_commands = f.read()
-            
-            # Execute each statement
-            for statement in sql_commands.split(';'):
-                if statement.strip():
-                    self.db.execute(statement)
         else:
             # Use inline schema
-            self._create_tables()
+            sql_commands = self._inline_schema()
+        
+        # executescript() parses statements itself (no naive split on ';')
+        # and the explicit transaction commits the whole schema at once
+        conn = self.db.connection
+        try:
+            conn.executescript(f"BEGIN;\n{sql_commands}\nCOMMIT;")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            raise Exception(f"Schema creation error: {e}")
+        
+        self._backfill_latest()
+        self._backfill_hourly()
+        self._seed_row_counts()
+    
+    def _migrate_ts_ms(self) -> None:
+        """
+        Add and backfill the ts_ms column on tables created before it existed
+        
+        Tables created by older versions (or by cluster_node_monitor.py)
+        only have the TEXT timestamp; range queries now filter on ts_ms.
+        node_status also gets checks_covered, which downtime stats sum.
+        """
+        for table in self.TABLES:
+            columns = self.db.get_columns(table)
+            if columns and 'ts_ms' not in columns:
+                self.db.execute(f"ALTER TABLE {table} ADD COLUMN ts_ms INTEGER")
+                self.db.execute(
+                    f"UPDATE {table} SET ts_ms = "
+                    + TS_MS_SQL.format("timestamp, 'utc'")
+                )
+        
+        # Older node_status rows each stand for a single check
+        columns = self.db.get_columns('node_status')
+        if columns and 'checks_covered' not in columns:
+            self.db.execute(
+                "ALTER TABLE node_status ADD COLUMN checks_covered INTEGER NOT NULL DEFAULT 1"
+            )
     
-    def _create_tables(self) -> None:
-        """Create database tables inline"""
+    def _inline_schema(self) -> str:
+        """
+        Build the inline schema script
+        
+        Returns:
+            SQL script creating all tables and indexes
+        """
+        statements = []
+        
         # Node status table
-        self.db.execute("""
+        statements.append(f"""
             CREATE TABLE IF NOT EXISTS node_status (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 timestamp TEXT NOT NULL,
+                {TS_MS_COLUMN},
                 cluster TEXT NOT NULL,
                 node_name TEXT NOT NULL,
                 status TEXT NOT NULL,
                 slurm_state TEXT,
                 is_available BOOLEAN NOT NULL,
-                checked_from TEXT NOT NULL
+                checked_from TEXT NOT NULL,
+                checks_covered INTEGER NOT NULL DEFAULT 1
             )
         """)
         
         # Node events table
-        self.db.execute("""
+        statements.append(f"""
             CREATE TABLE IF NOT EXISTS node_events (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 timestamp TEXT NOT NULL,
+                {TS_MS_COLUMN},
                 cluster TEXT NOT NULL,
                 node_name TEXT NOT NULL,
                 event_type TEXT NOT NULL,
@@ -81,10 +377,11 @@ class ClusterMonitorDB:
         """)
         
         # Recovery attempts table
-        self.db.execute("""
+        statements.append(f"""
             CREATE TABLE IF NOT EXISTS recovery_attempts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 timestamp TEXT NOT NULL,
+                {TS_MS_COLUMN},
                 cluster TEXT NOT NULL,
                 node_name TEXT NOT NULL,
                 command TEXT NOT NULL,
@@ -94,23 +391,118 @@ class ClusterMonitorDB:
             )
         """)
         
+        # Latest status per node
+        statements.append("""
+            CREATE TABLE IF NOT EXISTS node_status_latest (
+                cluster TEXT NOT NULL,
+                node_name TEXT NOT NULL,
+                slurm_state TEXT,
+                is_available BOOLEAN NOT NULL,
+                timestamp TEXT NOT NULL,
+                ts_ms INTEGER NOT NULL,
+                PRIMARY KEY (cluster, node_name)
+            ) WITHOUT ROWID
+        """)
+        
+        # Per-node check counts in hourly buckets, for long-range downtime
+        statements.append("""
+            CREATE TABLE IF NOT EXISTS node_status_hourly (
+                cluster TEXT NOT NULL,
+                node_name TEXT NOT NULL,
+                bucket_ms INTEGER NOT NULL,
+                checks INTEGER NOT NULL,
+                down_checks INTEGER NOT NULL,
+                PRIMARY KEY (cluster, node_name, bucket_ms)
+            ) WITHOUT ROWID
+        """)
+        
+        # Per-check availability bitmap of a whole cluster
+        statements.append(f"""
+            CREATE TABLE IF NOT EXISTS node_status_snapshot (
+                cluster TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                {TS_MS_COLUMN},
+                node_names TEXT NOT NULL,
+                node_count INTEGER NOT NULL,
+                availability_bitmap BLOB NOT NULL,
+                PRIMARY KEY (cluster, ts_ms)
+            )
+        """)
+        
+        # Row counters for get_database_stats
+        statements.append("""
+            CREATE TABLE IF NOT EXISTS row_counts (
+                table_name TEXT PRIMARY KEY,
+                n INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        
         # Create indexes
-        self._create_indexes()
+        statements.extend(self._index_statements())
+        
+        return ';\n'.join(statements) + ';'
     
-    def _create_indexes(self) -> None:
-        """Create database indexes for performance"""
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_node_status_timestamp ON node_status(timestamp)",
+    def _backfill_latest(self) -> None:
+        """Seed node_status_latest from history when it is still empty"""
+        if self.db.execute("SELECT 1 FROM node_status_latest LIMIT 1").fetchone():
+            return
+        
+        self.db.execute("""
+            INSERT OR REPLACE INTO node_status_latest 
+            (cluster, node_name, slurm_state, is_available, timestamp, ts_ms)
+            SELECT cluster, node_name, slurm_state, is_available, timestamp, ts_ms
+            FROM node_status
+            ORDER BY id
+        """)
+    
+    def _backfill_hourly(self) -> None:
+        """Roll up the existing history when node_status_hourly is still empty"""
+        if self.db.execute("SELECT 1 FROM node_status_hourly LIMIT 1").fetchone():
+            return
+        
+        self.db.execute(f"""
+            INSERT INTO node_status_hourly 
+            (cluster, node_name, bucket_ms, checks, down_checks)
+            SELECT cluster, node_name, ts_ms - ts_ms % {HOURLY_BUCKET_MS},
+                   SUM(checks_covered), SUM(checks_covered * (1 - is_available))
+            FROM node_status
+            GROUP BY 1, 2, 3
+        """)
+    
+    def _seed_row_counts(self) -> None:
+        """Count each history table once when it has no counter yet"""
+        for table in self.TABLES:
+            if self.db.execute(
+                "SELECT 1 FROM row_counts WHERE table_name = ?", (table,)
+            ).fetchone():
+                continue
+            self.db.execute(
+                f"INSERT INTO row_counts (table_name, n) SELECT ?, COUNT(*) FROM {table}",
+                (table,)
+            )
+    
+    def _index_statements(self) -> List[str]:
+        """Database indexes for performance"""
+        return [
+            "CREATE INDEX IF NOT EXISTS idx_node_status_ts_ms ON node_status(ts_ms)",
             "CREATE INDEX IF NOT EXISTS idx_node_status_cluster_node ON node_status(cluster, node_name)",
-            "CREATE INDEX IF NOT EXISTS idx_node_events_timestamp ON node_events(timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_node_events_ts_ms ON node_events(ts_ms)",
             "CREATE INDEX IF NOT EXISTS idx_node_events_cluster_node ON node_events(cluster, node_name)",
             "CREATE INDEX IF NOT EXISTS idx_node_events_severity ON node_events(severity)",
-            "CREATE INDEX IF NOT EXISTS idx_recovery_timestamp ON recovery_attempts(timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_recovery_ts_ms ON recovery_attempts(ts_ms)",
             "CREATE INDEX IF NOT EXISTS idx_recovery_cluster_node ON recovery_attempts(cluster, node_name)",
+            "CREATE INDEX IF NOT EXISTS idx_snapshot_ts_ms ON node_status_snapshot(ts_ms)",
+            # Covering indexes: get_downtime_stats and get_problem_history are
+            # answered from the index without touching table rows
+            "CREATE INDEX IF NOT EXISTS idx_ns_cluster_ts_avail "
+            "ON node_status(cluster, ts_ms, node_name, is_available, checks_covered)",
+            "CREATE INDEX IF NOT EXISTS idx_ne_filter "
+            "ON node_events(cluster, node_name, severity, event_type, ts_ms)",
+            # Partial index holding only node_down problem events
+            "CREATE INDEX IF NOT EXISTS idx_ne_problem "
+            "ON node_events(cluster, node_name, ts_ms, timestamp) "
+            "WHERE severity IN ('warning', 'error', 'critical') AND event_type = 'node_down'",
         ]
-        
-        for index_sql in indexes:
-            self.db.execute(index_sql)
     
     def log_node_status(self, cluster: str, node_name: str, status: str,
                        slurm_state: str, is_available: bool, checked_from: str) -> int:
@@ -128,15 +520,26 @@ class ClusterMonitorDB:
         Returns:
             Row ID of inserted record
         """
-        timestamp = datetime.datetime.now().isoformat()
+        timestamp, ts_ms = _now()
         
-        result = self.db.execute("""
-            INSERT INTO node_status 
-            (timestamp, cluster, node_name, status, slurm_state, is_available, checked_from)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (timestamp, cluster, node_name, status, slurm_state, is_available, checked_from))
+        with self._transaction() as conn:
+            row_id = self._insert(
+                conn,
+                self.INSERT_NODE_STATUS,
+                (timestamp, ts_ms, cluster, node_name, status, slurm_state, is_available,
+                 checked_from)
+            )
+            conn.execute(
+                self.UPSERT_NODE_STATUS_LATEST,
+                (cluster, node_name, slurm_state, is_available, timestamp, ts_ms)
+            )
+            conn.execute(
+                self.UPSERT_NODE_STATUS_HOURLY,
+                (cluster, node_name, ts_ms - ts_ms % HOURLY_BUCKET_MS, 0 if is_available else 1)
+            )
+            conn.execute(self.UPDATE_ROW_COUNT, (1, 'node_status'))
         
-        return result.lastrowid
+        return row_id
     
     def log_node_status_batch(self, cluster: str, node_statuses: Dict[str, Dict],
                               checked_from: str) -> int:
@@ -151,26 +554,59 @@ class ClusterMonitorDB:
         Returns:
             Number of records inserted
         """
-        timestamp = datetime.datetime.now().isoformat()
-        count = 0
+        timestamp, ts_ms = _now()
         
-        for node_name, status_info in node_statuses.items():
-            self.db.execute("""
-                INSERT INTO node_status 
-                (timestamp, cluster, node_name, status, slurm_state, is_available, checked_from)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
+        rows = [
+            (
                 timestamp,
+                ts_ms,
                 cluster,
                 node_name,
                 'ok' if status_info['is_available'] else 'problem',
                 status_info['slurm_state'],
                 status_info['is_available'],
                 checked_from
-            ))
-            count += 1
+            )
+            for node_name, status_info in node_statuses.items()
+        ]
         
-        return count
+        # One transaction and one prepared statement for the whole batch
+        with self._transaction() as conn:
+            conn.executemany(self.INSERT_NODE_STATUS, rows)
+            conn.executemany(
+                self.UPSERT_NODE_STATUS_LATEST,
+                [
+                    (cluster, node_name, status_info['slurm_state'],
+                     status_info['is_available'], timestamp, ts_ms)
+                    for node_name, status_info in node_statuses.items()
+                ]
+            )
+            conn.executemany(
+                self.UPSERT_NODE_STATUS_HOURLY,
+                [
+                    (cluster, node_name, ts_ms - ts_ms % HOURLY_BUCKET_MS,
+                     0 if status_info['is_available'] else 1)
+                    for node_name, status_info in node_statuses.items()
+                ]
+            )
+            conn.execute(self.UPDATE_ROW_COUNT, (len(rows), 'node_status'))
+            conn.execute(
+                self.INSERT_NODE_STATUS_SNAPSHOT,
+                (
+                    cluster,
+                    timestamp,
+                    ts_ms,
+                    ','.join(node_statuses),
+                    len(node_statuses),
+                    _pack_availability(
+                        status_info['is_available']
+                        for status_info in node_statuses.values()
+                    )
+                )
+            )
+            conn.execute(self.UPDATE_ROW_COUNT, (1, 'node_status_snapshot'))
+        
+        return len(rows)
     
     def log_event(self, cluster: str, node_name: str, event_type: str,
                   details: str, severity: str = 'info') -> int:
@@ -187,15 +623,17 @@ class ClusterMonitorDB:
         Returns:
             Row ID of inserted record
         """
-        timestamp = datetime.datetime.now().isoformat()
+        timestamp, ts_ms = _now()
         
-        result = self.db.execute("""
-            INSERT INTO node_events 
-            (timestamp, cluster, node_name, event_type, details, severity)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (timestamp, cluster, node_name, event_type, details, severity))
+        with self._transaction() as conn:
+            row_id = self._insert(
+                conn,
+                self.INSERT_NODE_EVENT,
+                (timestamp, ts_ms, cluster, node_name, event_type, details, severity)
+            )
+            conn.execute(self.UPDATE_ROW_COUNT, (1, 'node_events'))
         
-        return result.lastrowid
+        return row_id
     
     def log_recovery_attempt(self, cluster: str, node_name: str, command: str,
                            exit_code: Optional[int], output: str, success: bool) -> int:
@@ -213,15 +651,17 @@ class ClusterMonitorDB:
         Returns:
             Row ID of inserted record
         """
-        timestamp = datetime.datetime.now().isoformat()
+        timestamp, ts_ms = _now()
         
-        result = self.db.execute("""
-            INSERT INTO recovery_attempts 
-            (timestamp, cluster, node_name, command, exit_code, output, success)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (timestamp, cluster, node_name, command, exit_code, output, success))
+        with self._transaction() as conn:
+            row_id = self._insert(
+                conn,
+                self.INSERT_RECOVERY_ATTEMPT,
+                (timestamp, ts_ms, cluster, node_name, command, exit_code, output, success)
+            )
+            conn.execute(self.UPDATE_ROW_COUNT, (1, 'recovery_attempts'))
         
-        return result.lastrowid
+        return row_id
     
     def get_latest_status(self, cluster: Optional[str] = None) -> List[tuple]:
         """
@@ -233,23 +673,21 @@ class ClusterMonitorDB:
         Returns:
             List of tuples: (cluster, node_name, slurm_state, is_available, timestamp)
         """
+        conditions = []
+        params = []
+        
         if cluster:
-            query = """
-                SELECT cluster, node_name, slurm_state, is_available, timestamp
-                FROM node_status
-                WHERE timestamp = (SELECT MAX(timestamp) FROM node_status)
-                AND cluster = ?
-                ORDER BY cluster, node_name
-            """
-            return self.db.execute(query, (cluster,)).fetchall()
-        else:
-            query = """
-                SELECT cluster, node_name, slurm_state, is_available, timestamp
-                FROM node_status
-                WHERE timestamp = (SELECT MAX(timestamp) FROM node_status)
-                ORDER BY cluster, node_name
-            """
-            return self.db.execute(query).fetchall()
+            conditions.append("cluster = ?")
+            params.append(cluster)
+        
+        query = _sql("""
+            SELECT cluster, node_name, slurm_state, is_available, timestamp
+            FROM node_status_latest
+            WHERE {where}
+            ORDER BY cluster, node_name
+        """, tuple(conditions))
+        
+        return self.db_ro.execute(query, tuple(params)).fetchall()
     
     def get_problem_nodes(self, cluster: Optional[str] = None) -> List[tuple]:
         """
@@ -261,30 +699,29 @@ class ClusterMonitorDB:
         Returns:
             List of tuples: (cluster, node_name, slurm_state, timestamp)
         """
+        conditions = ["is_available = 0"]
+        params = []
+        
         if cluster:
-            query = """
-                SELECT cluster, node_name, slurm_state, timestamp
-                FROM node_status
-                WHERE timestamp = (SELECT MAX(timestamp) FROM node_status)
-                AND is_available = 0
-                AND cluster = ?
-                ORDER BY cluster, node_name
-            """
-            return self.db.execute(query, (cluster,)).fetchall()
-        else:
-            query = """
-                SELECT cluster, node_name, slurm_state, timestamp
-                FROM node_status
-                WHERE timestamp = (SELECT MAX(timestamp) FROM node_status)
-                AND is_available = 0
-                ORDER BY cluster, node_name
-            """
-            return self.db.execute(query).fetchall()
+            conditions.append("cluster = ?")
+            params.append(cluster)
+        
+        query = _sql("""
+            SELECT cluster, node_name, slurm_state, timestamp
+            FROM node_status_latest
+            WHERE {where}
+            ORDER BY cluster, node_name
+        """, tuple(conditions))
+        
+        return self.db_ro.execute(query, tuple(params)).fetchall()
     
     def get_events(self, cluster: Optional[str] = None, node_name: Optional[str] = None,
-                   days: int = 7, severity: Optional[str] = None) -> List[tuple]:
+                   days: int = 7, severity: Optional[str] = None) -> Iterator[tuple]:
         """
-        Get events with optional filters
+        Get events with optional filters, newest first
+        
+        Events are ordered by id, which matches time order only because
+        log_event always stamps rows with the current time (never backdated).
         
         Args:
             cluster: Optional cluster filter
@@ -293,11 +730,11 @@ class ClusterMonitorDB:
             severity: Optional severity filter
             
         Returns:
-            List of event tuples
+            Iterator of event tuples
         """
-        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        cutoff = _cutoff_ms(days)
         
-        conditions = ["timestamp > ?"]
+        conditions = ["ts_ms > ?"]
         params = [cutoff]
         
         if cluster:
@@ -312,16 +749,16 @@ class ClusterMonitorDB:
             conditions.append("severity = ?")
             params.append(severity)
         
-        query = f"""
+        query = _sql("""
             SELECT timestamp, cluster, node_name, event_type, details, severity
             FROM node_events
-            WHERE {' AND '.join(conditions)}
-            ORDER BY timestamp DESC
-        """
+            WHERE {where}
+            ORDER BY id DESC
+        """, tuple(conditions))
         
-        return self.db.execute(query, tuple(params)).fetchall()
+        yield from self._stream(query, tuple(params))
     
-    def get_problem_history(self, days: int = 7, cluster: Optional[str] = None) -> List[tuple]:
+    def get_problem_history(self, days: int = 7, cluster: Optional[str] = None) -> Iterator[tuple]:
         """
         Get problem history statistics
         
@@ -330,37 +767,30 @@ class ClusterMonitorDB:
             cluster: Optional cluster filter
             
         Returns:
-            List of tuples: (cluster, node_name, count, first_seen, last_seen)
+            Iterator of tuples: (cluster, node_name, count, first_seen, last_seen)
         """
-        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        conditions = ["ts_ms > ?"]
+        params = [_cutoff_ms(days)]
         
         if cluster:
-            query = """
-                SELECT cluster, node_name, COUNT(*) as problem_count,
-                       MIN(timestamp) as first_seen,
-                       MAX(timestamp) as last_seen
-                FROM node_events
-                WHERE timestamp > ? 
-                AND severity IN ('warning', 'error', 'critical')
-                AND event_type = 'node_down'
-                AND cluster = ?
-                GROUP BY cluster, node_name
-                ORDER BY problem_count DESC, cluster, node_name
-            """
-            return self.db.execute(query, (cutoff, cluster)).fetchall()
-        else:
-            query = """
-                SELECT cluster, node_name, COUNT(*) as problem_count,
-                       MIN(timestamp) as first_seen,
-                       MAX(timestamp) as last_seen
-                FROM node_events
-                WHERE timestamp > ? 
-                AND severity IN ('warning', 'error', 'critical')
-                AND event_type = 'node_down'
-                GROUP BY cluster, node_name
-                ORDER BY problem_count DESC, cluster, node_name
-            """
-            return self.db.execute(query, (cutoff,)).fetchall()
+            conditions.append("cluster = ?")
+            params.append(cluster)
+        
+        # The severity/event_type terms must match idx_ne_problem's WHERE
+        # clause verbatim for the planner to pick the partial index
+        query = _sql("""
+            SELECT cluster, node_name, COUNT(*) as problem_count,
+                   MIN(timestamp) as first_seen,
+                   MAX(timestamp) as last_seen
+            FROM node_events
+            WHERE severity IN ('warning', 'error', 'critical')
+            AND event_type = 'node_down'
+            AND {where}
+            GROUP BY cluster, node_name
+            ORDER BY problem_count DESC, cluster, node_name
+        """, tuple(conditions))
+        
+        yield from self._stream(query, tuple(params))
     
     def get_recovery_stats(self, days: int = 7, cluster: Optional[str] = None) -> List[tuple]:
         """
@@ -373,35 +803,32 @@ class ClusterMonitorDB:
         Returns:
             List of tuples: (cluster, node_name, successful, failed)
         """
-        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        conditions = ["ts_ms > ?"]
+        params = [_cutoff_ms(days)]
         
         if cluster:
-            query = """
-                SELECT cluster, node_name,
-                       SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful,
-                       SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed
-                FROM recovery_attempts
-                WHERE timestamp > ? AND cluster = ?
-                GROUP BY cluster, node_name
-                ORDER BY cluster, node_name
-            """
-            return self.db.execute(query, (cutoff, cluster)).fetchall()
-        else:
-            query = """
-                SELECT cluster, node_name,
-                       SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful,
-                       SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed
-                FROM recovery_attempts
-                WHERE timestamp > ?
-                GROUP BY cluster, node_name
-                ORDER BY cluster, node_name
-            """
-            return self.db.execute(query, (cutoff,)).fetchall()
+            conditions.append("cluster = ?")
+            params.append(cluster)
+        
+        query = _sql("""
+            SELECT cluster, node_name,
+                   SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful,
+                   SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed
+            FROM recovery_attempts
+            WHERE {where}
+            GROUP BY cluster, node_name
+            ORDER BY cluster, node_name
+        """, tuple(conditions))
+        
+        return self.db_ro.execute(query, tuple(params)).fetchall()
     
     def get_downtime_stats(self, days: int = 7, cluster: Optional[str] = None) -> List[tuple]:
         """
         Get downtime statistics
         
+        Checks are summed from checks_covered: a node_status row written by
+        cluster_node_monitor.py also stands for the unchanged checks after it.
+        
         Args:
             days: Number of days to look back
             cluster: Optional cluster filter
@@ -409,32 +836,54 @@ class ClusterMonitorDB:
         Returns:
             List of tuples: (cluster, node_name, total_checks, down_checks)
         """
-        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        conditions = ["ts_ms > ?"]
+        params = [_cutoff_ms(days)]
         
         if cluster:
-            query = """
-                SELECT cluster, node_name,
-                       COUNT(*) as total_checks,
-                       SUM(CASE WHEN is_available = 0 THEN 1 ELSE 0 END) as down_checks
-                FROM node_status
-                WHERE timestamp > ? AND cluster = ?
-                GROUP BY cluster, node_name
-                HAVING down_checks > 0
-                ORDER BY down_checks DESC, cluster, node_name
-            """
-            return self.db.execute(query, (cutoff, cluster)).fetchall()
-        else:
-            query = """
-                SELECT cluster, node_name,
-                       COUNT(*) as total_checks,
-                       SUM(CASE WHEN is_available = 0 THEN 1 ELSE 0 END) as down_checks
-                FROM node_status
-                WHERE timestamp > ?
-                GROUP BY cluster, node_name
-                HAVING down_checks > 0
-                ORDER BY down_checks DESC, cluster, node_name
-            """
-            return self.db.execute(query, (cutoff,)).fetchall()
+            conditions.append("cluster = ?")
+            params.append(cluster)
+        
+        query = _sql("""
+            SELECT cluster, node_name,
+                   SUM(checks_covered) as total_checks,
+                   SUM(CASE WHEN is_available = 0 THEN checks_covered ELSE 0 END) as down_checks
+            FROM node_status
+            WHERE {where}
+            GROUP BY cluster, node_name
+            HAVING down_checks > 0
+            ORDER BY down_checks DESC, cluster, node_name
+        """, tuple(conditions))
+        
+        return self.db_ro.execute(query, tuple(params)).fetchall()
+    
+    def get_availability_history(self, days: int = 7,
+                                 cluster: Optional[str] = None) -> Iterator[tuple]:
+        """
+        Get per-check cluster availability from the batch snapshots
+        
+        Args:
+            days: Number of days to look back
+            cluster: Optional cluster filter
+            
+        Returns:
+            Iterator of tuples: (cluster, timestamp, total_nodes, available_nodes)
+        """
+        conditions = ["ts_ms > ?"]
+        params = [_cutoff_ms(days)]
+        
+        if cluster:
+            conditions.append("cluster = ?")
+            params.append(cluster)
+        
+        query = _sql("""
+            SELECT cluster, timestamp, node_count,
+                   popcount(availability_bitmap) as available_nodes
+            FROM node_status_snapshot
+            WHERE {where}
+            ORDER BY cluster, ts_ms
+        """, tuple(conditions))
+        
+        yield from self._stream(query, tuple(params))
     
     def get_cluster_summary(self) -> List[tuple]:
         """
@@ -448,11 +897,10 @@ class ClusterMonitorDB:
                    COUNT(*) as total_nodes,
                    SUM(CASE WHEN is_available = 1 THEN 1 ELSE 0 END) as healthy,
                    SUM(CASE WHEN is_available = 0 THEN 1 ELSE 0 END) as problem
-            FROM node_status
-            WHERE timestamp = (SELECT MAX(timestamp) FROM node_status)
+            FROM node_status_latest
             GROUP BY cluster
         """
-        return self.db.execute(query).fetchall()
+        return self.db_ro.execute(query).fetchall()
     
     def cleanup_old_records(self, days: int = 90) -> Dict[str, int]:
         """
@@ -464,24 +912,34 @@ class ClusterMonitorDB:
         Returns:
             Dictionary with count of deleted records per table
         """
-        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        cutoff = _cutoff_ms(days)
         
         deleted = {}
         
-        # Delete old node_status records
-        result = self.db.execute("DELETE FROM node_status WHERE timestamp < ?", (cutoff,))
-        deleted['node_status'] = result.rowcount
-        
-        # Delete old node_events records
-        result = self.db.execute("DELETE FROM node_events WHERE timestamp < ?", (cutoff,))
-        deleted['node_events'] = result.rowcount
-        
-        # Delete old recovery_attempts records
-        result = self.db.execute("DELETE FROM recovery_attempts WHERE timestamp < ?", (cutoff,))
-        deleted['recovery_attempts'] = result.rowcount
-        
-        # Vacuum to reclaim space
-        self.db.execute("VACUUM")
+        # Delete in small batches, each in its own transaction, so the
+        # write lock is only ever held briefly and monitors keep logging
+        for table in self.TABLES:
+            deleted[table] = 0
+            while True:
+                with self._transaction() as conn:
+                    result = conn.execute(f"""
+                        DELETE FROM {table} WHERE rowid IN (
+                            SELECT rowid FROM {table} WHERE ts_ms < ? LIMIT ?
+                        )
+                    """, (cutoff, self.CLEANUP_BATCH_SIZE))
+                    count = result.rowcount
+                    conn.execute(self.UPDATE_ROW_COUNT, (-count, table))
+                deleted[table] += count
+                if count < self.CLEANUP_BATCH_SIZE:
+                    break
+        
+        # Release free pages without VACUUM's exclusive full-file rewrite.
+        # The pragma frees one page per step and sqlite3's execute() only
+        # steps once, so run it through executescript() to completion.
+        self.db.connection.executescript("PRAGMA incremental_vacuum(1000);")
+        
+        # Fold the deletes back into the main file and shrink the WAL
+        self.db.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
         
         return deleted
     
@@ -494,30 +952,25 @@ class ClusterMonitorDB:
         """
         stats = {}
         
-        # Record counts
-        stats['node_status_count'] = self.db.execute(
-            "SELECT COUNT(*) FROM node_status"
-        ).fetchone()[0]
-        
-        stats['node_events_count'] = self.db.execute(
-            "SELECT COUNT(*) FROM node_events"
-        ).fetchone()[0]
-        
-        stats['recovery_attempts_count'] = self.db.execute(
-            "SELECT COUNT(*) FROM recovery_attempts"
-        ).fetchone()[0]
+        # Record counts, read from the maintained counters
+        counts = dict(
+            tuple(row) for row in
+            self.db_ro.execute("SELECT table_name, n FROM row_counts").fetchall()
+        )
+        for table in self.TABLES:
+            stats[f'{table}_count'] = counts.get(table, 0)
         
         # Date range
-        oldest = self.db.execute(
-            "SELECT MIN(timestamp) FROM node_status"
-        ).fetchone()[0]
+        oldest = self.db_ro.execute(
+            "SELECT timestamp FROM node_status ORDER BY ts_ms LIMIT 1"
+        ).fetchone()
         
-        newest = self.db.execute(
-            "SELECT MAX(timestamp) FROM node_status"
-        ).fetchone()[0]
+        newest = self.db_ro.execute(
+            "SELECT timestamp FROM node_status ORDER BY ts_ms DESC LIMIT 1"
+        ).fetchone()
         
-        stats['oldest_record'] = oldest
-        stats['newest_record'] = newest
+        stats['oldest_record'] = oldest[0] if oldest else None
+        stats['newest_record'] = newest[0] if newest else None
         
         # Database file size
         if self.db_path.exists():
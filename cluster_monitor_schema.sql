@@ -3,17 +3,23 @@
 
 -- ============================================================================
 -- Table: node_status
--- Purpose: Records every node status check performed
+-- Purpose: Records node status checks; cluster_node_monitor.py skips
+--          unchanged snapshots and counts them in checks_covered
 -- ============================================================================
 CREATE TABLE IF NOT EXISTS node_status (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp TEXT NOT NULL,           -- ISO format timestamp
+    ts_ms INTEGER NOT NULL DEFAULT (CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)),
+                                       -- Epoch milliseconds, used for range queries
     cluster TEXT NOT NULL,             -- Cluster name (spydur, arachne)
     node_name TEXT NOT NULL,           -- Node hostname
     status TEXT NOT NULL,              -- 'ok' or 'problem'
     slurm_state TEXT,                  -- SLURM state string (idle, down, drain, etc.)
     is_available BOOLEAN NOT NULL,     -- 1 if available, 0 if problem
-    checked_from TEXT NOT NULL         -- Hostname that performed the check
+    checked_from TEXT NOT NULL,        -- Hostname that performed the check
+    checks_covered INTEGER NOT NULL DEFAULT 1
+                                       -- Checks this row stands for (it and the
+                                       -- unchanged ones after it)
 );
 
 -- ============================================================================
@@ -23,6 +29,8 @@ CREATE TABLE IF NOT EXISTS node_status (
 CREATE TABLE IF NOT EXISTS node_events (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp TEXT NOT NULL,           -- ISO format timestamp
+    ts_ms INTEGER NOT NULL DEFAULT (CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)),
+                                       -- Epoch milliseconds, used for range queries
     cluster TEXT NOT NULL,             -- Cluster name
     node_name TEXT NOT NULL,           -- Node hostname
     event_type TEXT NOT NULL,          -- Type: node_down, recovery_started, etc.
@@ -37,6 +45,8 @@ CREATE TABLE IF NOT EXISTS node_events (
 CREATE TABLE IF NOT EXISTS recovery_attempts (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp TEXT NOT NULL,           -- ISO format timestamp
+    ts_ms INTEGER NOT NULL DEFAULT (CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)),
+                                       -- Epoch milliseconds, used for range queries
     cluster TEXT NOT NULL,             -- Cluster name
     node_name TEXT NOT NULL,           -- Node hostname
     command TEXT NOT NULL,             -- Command that was executed
@@ -45,13 +55,63 @@ CREATE TABLE IF NOT EXISTS recovery_attempts (
     success BOOLEAN NOT NULL           -- 1 if successful, 0 if failed
 );
 
+-- ============================================================================
+-- Table: node_status_latest
+-- Purpose: Most recent status per node, replaced on every status write
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS node_status_latest (
+    cluster TEXT NOT NULL,             -- Cluster name
+    node_name TEXT NOT NULL,           -- Node hostname
+    slurm_state TEXT,                  -- SLURM state string
+    is_available BOOLEAN NOT NULL,     -- 1 if available, 0 if problem
+    timestamp TEXT NOT NULL,           -- ISO format timestamp of the check
+    ts_ms INTEGER NOT NULL,            -- Epoch milliseconds of the check
+    PRIMARY KEY (cluster, node_name)
+) WITHOUT ROWID;
+
+-- ============================================================================
+-- Table: node_status_hourly
+-- Purpose: Per-node check counts in hourly buckets, for long-range downtime
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS node_status_hourly (
+    cluster TEXT NOT NULL,             -- Cluster name
+    node_name TEXT NOT NULL,           -- Node hostname
+    bucket_ms INTEGER NOT NULL,        -- Epoch milliseconds of the hour's start
+    checks INTEGER NOT NULL,           -- Checks of the node in the hour
+    down_checks INTEGER NOT NULL,      -- Checks that found it unavailable
+    PRIMARY KEY (cluster, node_name, bucket_ms)
+) WITHOUT ROWID;
+
+-- ============================================================================
+-- Table: node_status_snapshot
+-- Purpose: One row per batch check of a cluster, availability packed as bits
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS node_status_snapshot (
+    cluster TEXT NOT NULL,             -- Cluster name
+    timestamp TEXT NOT NULL,           -- ISO format timestamp of the check
+    ts_ms INTEGER NOT NULL DEFAULT (CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)),
+    node_names TEXT NOT NULL,          -- Comma-separated node names, bit order
+    node_count INTEGER NOT NULL,       -- Number of nodes checked
+    availability_bitmap BLOB NOT NULL, -- Bit i set if node i was available
+    PRIMARY KEY (cluster, ts_ms)
+);
+
+-- ============================================================================
+-- Table: row_counts
+-- Purpose: Exact row count per history table, maintained on insert/delete
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS row_counts (
+    table_name TEXT PRIMARY KEY,       -- History table name
+    n INTEGER NOT NULL                 -- Current number of rows
+) WITHOUT ROWID;
+
 -- ============================================================================
 -- Indexes for Performance
 -- ============================================================================
 
 -- Indexes for node_status table
-CREATE INDEX IF NOT EXISTS idx_node_status_timestamp 
-    ON node_status(timestamp);
+CREATE INDEX IF NOT EXISTS idx_node_status_ts_ms 
+    ON node_status(ts_ms);
 
 CREATE INDEX IF NOT EXISTS idx_node_status_cluster_node 
     ON node_status(cluster, node_name);
@@ -59,9 +119,13 @@ CREATE INDEX IF NOT EXISTS idx_node_status_cluster_node
 CREATE INDEX IF NOT EXISTS idx_node_status_available 
     ON node_status(is_available);
 
+-- Covering index for downtime statistics (cluster + time window)
+CREATE INDEX IF NOT EXISTS idx_ns_cluster_ts_avail 
+    ON node_status(cluster, ts_ms, node_name, is_available, checks_covered);
+
 -- Indexes for node_events table
-CREATE INDEX IF NOT EXISTS idx_node_events_timestamp 
-    ON node_events(timestamp);
+CREATE INDEX IF NOT EXISTS idx_node_events_ts_ms 
+    ON node_events(ts_ms);
 
 CREATE INDEX IF NOT EXISTS idx_node_events_cluster_node 
     ON node_events(cluster, node_name);
@@ -72,9 +136,18 @@ CREATE INDEX IF NOT EXISTS idx_node_events_severity
 CREATE INDEX IF NOT EXISTS idx_node_events_type 
     ON node_events(event_type);
 
+-- Covering index for problem history filters
+CREATE INDEX IF NOT EXISTS idx_ne_filter 
+    ON node_events(cluster, node_name, severity, event_type, ts_ms);
+
+-- Partial index holding only node_down problem events
+CREATE INDEX IF NOT EXISTS idx_ne_problem 
+    ON node_events(cluster, node_name, ts_ms, timestamp)
+    WHERE severity IN ('warning', 'error', 'critical') AND event_type = 'node_down';
+
 -- Indexes for recovery_attempts table
-CREATE INDEX IF NOT EXISTS idx_recovery_timestamp 
-    ON recovery_attempts(timestamp);
+CREATE INDEX IF NOT EXISTS idx_recovery_ts_ms 
+    ON recovery_attempts(ts_ms);
 
 CREATE INDEX IF NOT EXISTS idx_recovery_cluster_node 
     ON recovery_attempts(cluster, node_name);
@@ -82,6 +155,10 @@ CREATE INDEX IF NOT EXISTS idx_recovery_cluster_node
 CREATE INDEX IF NOT EXISTS idx_recovery_success 
     ON recovery_attempts(success);
 
+-- Indexes for node_status_snapshot table
+CREATE INDEX IF NOT EXISTS idx_snapshot_ts_ms 
+    ON node_status_snapshot(ts_ms);
+
 -- ============================================================================
 -- Views for Common Queries
 -- ============================================================================
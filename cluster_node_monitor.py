@@ -30,12 +30,19 @@ if sys.version_info < min_py:
 ###
 import argparse
 import contextlib
+import dataclasses
 import datetime
+import io
 import json
 import logging
+import queue
+import re
+import shlex
 import signal
 import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -68,6 +75,88 @@ CONFIG_FILE = Path.home() / ".config" / "cluster_monitor" / "config.toml"
 DB_PATH = Path.home() / "cluster_monitor.db"
 LOG_FILE = Path.home() / "cluster_monitor.log"
 
+# Append-only workload: WAL lets the report read while the monitor writes,
+# and synchronous=NORMAL drops the fsync on every commit
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Multiplex every ssh to a head node over one persistent master connection,
+# so only the first call of a run pays for the TCP, key exchange and auth
+SSH_OPTIONS = (
+    "-o BatchMode=yes "
+    "-o ServerAliveInterval=30 "
+    "-o ControlMaster=auto "
+    "-o ControlPath=~/.ssh/cm-%r@%h:%p "
+    "-o ControlPersist=600"
+)
+
+# check_cluster reuses the last successful sinfo snapshot of a cluster
+# for this long (seconds); recovery verification uses the shorter
+# RECHECK_MAX_AGE and only snapshots taken after the recovery command
+SINFO_CACHE_TTL = 30.0
+RECHECK_MAX_AGE = 5.0
+
+# Seconds to wait before each re-check of a node after a recovery command
+RECOVERY_POLL_DELAYS = (1, 2, 4, 8)
+
+# A cluster's node states are written to node_status only when one of them
+# changed, or when the last written snapshot is older than this (seconds);
+# unchanged checks in between add to that snapshot's checks_covered
+STATUS_HEARTBEAT_SECONDS = 3600
+
+# Every table carries ts_ms, the epoch milliseconds of its (local time) ISO
+# timestamp, for range filters: an integer compares and indexes more
+# cheaply than ISO text. This computes it inside SQLite, for backfills.
+TS_MS_SQL = "CAST(ROUND((julianday({}) - 2440587.5) * 86400000) AS INTEGER)"
+
+# node_status_hourly counts each node's checks per bucket of this many ms
+HOURLY_BUCKET_MS = 3_600_000
+
+# Counts one check of a node in its hourly bucket: (cluster, node_name,
+# bucket_ms, 1 if down else 0)
+UPSERT_NODE_STATUS_HOURLY = """
+    INSERT INTO node_status_hourly 
+    (cluster, node_name, bucket_ms, checks, down_checks)
+    VALUES (?, ?, ?, 1, ?)
+    ON CONFLICT (cluster, node_name, bucket_ms) DO UPDATE SET
+        checks = checks + 1,
+        down_checks = down_checks + excluded.down_checks
+"""
+
+# Exact row counts of the history tables, shared with ClusterMonitorDB
+# (its get_database_stats reads them), kept current by every insert
+UPDATE_ROW_COUNT = "UPDATE row_counts SET n = n + ? WHERE table_name = ?"
+
+# cluster_name -> (time.monotonic() when fetched, node statuses)
+_SINFO_CACHE: Dict[str, Tuple[float, Dict[str, Dict]]] = {}
+
+# Flag characters sinfo appends to a node state (e.g. 'down*', 'idle~')
+SINFO_STATE_FLAGS = '*~#!%$@^-'
+
+# sinfo %t (compact) state names and their %T (long) spelling, so stored
+# slurm_state values read the same whichever format the check uses
+SINFO_STATE_NAMES = {
+    'alloc': 'allocated',
+    'comp': 'completing',
+    'drain': 'drained',
+    'drng': 'draining',
+    'failg': 'failing',
+    'futr': 'future',
+    'mix': 'mixed',
+    'npc': 'perfctrs',
+    'plnd': 'planned',
+    'pow_dn': 'power_down',
+    'pow_up': 'powering_up',
+    'resv': 'reserved',
+    'unk': 'unknown',
+}
+
 ###
 # Cluster configurations
 ###
@@ -75,28 +164,81 @@ CLUSTERS = {
     'spydur': {
         'user': 'installer',
         'head_node': 'spydur',
-        'nodes': [f'spdr{i:02d}' for i in range(1, 19)] + [f'spdr{i}' for i in range(50, 62)],
-        'check_command': 'sinfo -h -N -o "%N %T"',  # Node name and state
-        'recovery_commands': [
+        'nodes': frozenset([f'spdr{i:02d}' for i in range(1, 19)] + [f'spdr{i}' for i in range(50, 62)]),
+        'check_command': 'sinfo -h -N -o "%N,%t"',  # Node name and compact state
+        'recovery_commands': (
             'sudo -u slurm scontrol update nodename={node} state=resume',
             'ssh {node} "sudo systemctl restart slurmd"'
-        ],
-        'problem_states': ['down', 'drain', 'drng', 'fail', 'failing', 'maint', 'unk', 'unknown']
+        ),
+        'problem_states': ('down', 'drain', 'drng', 'fail', 'failing', 'maint', 'unk', 'unknown')
     },
     'arachne': {
         'user': 'zeus',
         'head_node': 'arachne',
-        'nodes': [f'node{i:02d}' for i in range(1, 4)] + [f'node{i}' for i in range(51, 54)],
-        'check_command': 'sinfo -h -N -o "%N %T"',
-        'recovery_commands': [
+        'nodes': frozenset([f'node{i:02d}' for i in range(1, 4)] + [f'node{i}' for i in range(51, 54)]),
+        'check_command': 'sinfo -h -N -o "%N,%t"',
+        'recovery_commands': (
             'sudo scontrol update nodename={node} state=resume',
             'ssh {node} "systemctl restart slurmd"'
-        ],
-        'problem_states': ['down', 'drain', 'drng', 'fail', 'failing', 'maint', 'unk', 'unknown']
+        ),
+        'problem_states': ('down', 'drain', 'drng', 'fail', 'failing', 'maint', 'unk', 'unknown')
     }
 }
 
 
+def _ts_ms(timestamp: str) -> int:
+    """Epoch milliseconds of a local ISO timestamp"""
+    return round(datetime.datetime.fromisoformat(timestamp).timestamp() * 1000)
+
+
+@dataclasses.dataclass(frozen=True)
+class ClusterCfg:
+    """
+    One cluster's settings, fixed once the configuration is loaded
+    
+    Explicit __slots__ rather than slots=True, which needs Python 3.10.
+    """
+    __slots__ = ('user', 'head_node', 'nodes', 'check_command',
+                 'recovery_commands', 'problem_states', 'problem_re', 'ssh_prefix')
+    
+    user: str
+    head_node: str
+    nodes: FrozenSet[str]
+    check_command: str
+    recovery_commands: Tuple[str, ...]
+    problem_states: Tuple[str, ...]
+    problem_re: re.Pattern
+    ssh_prefix: str
+    
+    @classmethod
+    def from_dict(cls, settings: Dict[str, Any]) -> 'ClusterCfg':
+        """
+        Build a cluster's settings from its CLUSTERS/TOML form
+        
+        problem_states are precompiled into one regex that is matched at
+        the start of each '+'-separated state token, so 'drain' covers
+        'drained' and 'draining' but 'down' does not match inside e.g.
+        'powered_down'.
+        
+        Args:
+            settings: Dictionary with the keys of a CLUSTERS entry
+            
+        Returns:
+            ClusterCfg instance
+        """
+        problem_states = tuple(settings['problem_states'])
+        return cls(
+            user=settings['user'],
+            head_node=settings['head_node'],
+            nodes=frozenset(settings['nodes']),
+            check_command=settings['check_command'],
+            recovery_commands=tuple(settings['recovery_commands']),
+            problem_states=problem_states,
+            problem_re=re.compile('|'.join(map(re.escape, problem_states)) or '(?!)'),
+            ssh_prefix=f"ssh {SSH_OPTIONS} {settings['user']}@{settings['head_node']}"
+        )
+
+
 class ClusterNodeMonitor:
     """Monitor and manage cluster nodes across multiple clusters"""
     
@@ -111,7 +253,19 @@ class ClusterNodeMonitor:
         self.config_file = config_file
         self.db_path = db_path
         self.control_host = socket.gethostname()  # Should be 'badenpowell'
-        self.clusters = CLUSTERS.copy()
+        self.clusters = {
+            cluster_name: ClusterCfg.from_dict(settings)
+            for cluster_name, settings in CLUSTERS.items()
+        }
+        
+        # One connection for all writes of this process; check_cluster logs
+        # from the pool threads, so writes are serialized by _db_lock. It is
+        # reentrant, so a transaction can span several log_* calls
+        self._db = URdb(str(self.db_path), check_same_thread=False)
+        self._db_lock = threading.RLock()
+        
+        # cluster_name -> ({node_name: slurm_state}, timestamp) last written
+        self._last_statuses = {}
         
         # Email configuration (will be overridden by config file)
         self.email_config = {
@@ -139,6 +293,12 @@ class ClusterNodeMonitor:
         
         # Initialize database
         self.init_database()
+        
+        # Mail goes out from a background thread so a slow relay does not
+        # hold up monitoring; flush_notifications() drains it before exit
+        self._mail_q = queue.Queue()
+        self._mail_thread = threading.Thread(target=self._mail_worker, daemon=True)
+        self._mail_thread.start()
     
     def load_config(self) -> None:
         """Load configuration from TOML file"""
@@ -155,7 +315,9 @@ class ClusterNodeMonitor:
             # Update cluster configurations
             for cluster_name in ['spydur', 'arachne']:
                 if cluster_name in config:
-                    self.clusters[cluster_name].update(config[cluster_name])
+                    self.clusters[cluster_name] = ClusterCfg.from_dict(
+                        {**CLUSTERS[cluster_name], **config[cluster_name]}
+                    )
             
             # Update email settings if present
             if 'email' in config:
@@ -214,19 +376,24 @@ recovery_wait_time = 60
     def init_database(self) -> None:
         """Initialize SQLite database with required tables"""
         try:
-            db = URdb(str(self.db_path))
+            db = self._db
+            
+            for pragma in DB_PRAGMAS:
+                db.execute(pragma)
             
             # Node status table
             db.execute("""
                 CREATE TABLE IF NOT EXISTS node_status (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     timestamp TEXT NOT NULL,
+                    ts_ms INTEGER,
                     cluster TEXT NOT NULL,
                     node_name TEXT NOT NULL,
                     status TEXT NOT NULL,
                     slurm_state TEXT,
                     is_available BOOLEAN NOT NULL,
-                    checked_from TEXT NOT NULL
+                    checked_from TEXT NOT NULL,
+                    checks_covered INTEGER NOT NULL DEFAULT 1
                 )
             """)
             
@@ -235,6 +402,7 @@ recovery_wait_time = 60
                 CREATE TABLE IF NOT EXISTS node_events (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     timestamp TEXT NOT NULL,
+                    ts_ms INTEGER,
                     cluster TEXT NOT NULL,
                     node_name TEXT NOT NULL,
                     event_type TEXT NOT NULL,
@@ -248,6 +416,7 @@ recovery_wait_time = 60
                 CREATE TABLE IF NOT EXISTS recovery_attempts (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     timestamp TEXT NOT NULL,
+                    ts_ms INTEGER,
                     cluster TEXT NOT NULL,
                     node_name TEXT NOT NULL,
                     command TEXT NOT NULL,
@@ -257,43 +426,211 @@ recovery_wait_time = 60
                 )
             """)
             
-            # Create indexes for better query performance
+            # Each node's row of its cluster's newest snapshot, kept current
+            # by log_status, so "latest status" reads never touch history
             db.execute("""
-                CREATE INDEX IF NOT EXISTS idx_node_status_timestamp 
-                ON node_status(timestamp)
+                CREATE TABLE IF NOT EXISTS node_status_latest (
+                    cluster TEXT NOT NULL,
+                    node_name TEXT NOT NULL,
+                    slurm_state TEXT,
+                    is_available BOOLEAN NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    ts_ms INTEGER NOT NULL,
+                    PRIMARY KEY (cluster, node_name)
+                ) WITHOUT ROWID
             """)
             
+            # Per-node check counts in hourly buckets, kept current by
+            # log_status, so long-range downtime reports read buckets
+            # instead of every raw check
             db.execute("""
-                CREATE INDEX IF NOT EXISTS idx_node_events_timestamp 
-                ON node_events(timestamp)
+                CREATE TABLE IF NOT EXISTS node_status_hourly (
+                    cluster TEXT NOT NULL,
+                    node_name TEXT NOT NULL,
+                    bucket_ms INTEGER NOT NULL,
+                    checks INTEGER NOT NULL,
+                    down_checks INTEGER NOT NULL,
+                    PRIMARY KEY (cluster, node_name, bucket_ms)
+                ) WITHOUT ROWID
             """)
             
+            # Row counters, as maintained by ClusterMonitorDB
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS row_counts (
+                    table_name TEXT PRIMARY KEY,
+                    n INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            
+            # Tables created before ts_ms existed get it added and backfilled
+            for table in ('node_status', 'node_events', 'recovery_attempts'):
+                if 'ts_ms' not in db.get_columns(table):
+                    db.execute(f"ALTER TABLE {table} ADD COLUMN ts_ms INTEGER")
+                    db.execute(
+                        f"UPDATE {table} SET ts_ms = "
+                        + TS_MS_SQL.format("timestamp, 'utc'")
+                    )
+            
+            # Rows written before snapshots were skipped each stand for one check
+            if 'checks_covered' not in db.get_columns('node_status'):
+                db.execute(
+                    "ALTER TABLE node_status ADD COLUMN "
+                    "checks_covered INTEGER NOT NULL DEFAULT 1"
+                )
+            
+            # Create indexes for better query performance; range filters
+            # use ts_ms, so the TEXT timestamp indexes of older databases
+            # are only dead weight on every insert
+            db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_node_status_ts_ms 
+                ON node_status(ts_ms)
+            """)
+            
+            db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_node_events_ts_ms 
+                ON node_events(ts_ms)
+            """)
+            
+            for index in ('idx_node_status_timestamp', 'idx_node_events_timestamp'):
+                db.execute(f"DROP INDEX IF EXISTS {index}")
+            
             db.execute("""
                 CREATE INDEX IF NOT EXISTS idx_node_events_cluster_node 
                 ON node_events(cluster, node_name)
             """)
             
+            # Covering indexes for generate_status_report: the time window
+            # and grouping are answered from the index without table rows
+            db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_events_tsms_sev_cluster 
+                ON node_events(ts_ms, severity, cluster, node_name, event_type)
+            """)
+            
+            db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_recov_tsms_cluster_success 
+                ON recovery_attempts(ts_ms, cluster, success)
+            """)
+            
+            # A cluster's snapshot by timestamp (adding a check to the last
+            # one's checks_covered, seeding node_status_latest) is a seek on this
+            db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ns_cluster_ts 
+                ON node_status(cluster, timestamp)
+            """)
+            
+            # Per-node time ranges for query_monitor_db: the downtime report
+            # (covering, already in GROUP BY order) and node detail
+            db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ns_cluster_node_tsms 
+                ON node_status(cluster, node_name, ts_ms, is_available, checks_covered)
+            """)
+            
+            db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_events_cluster_node_tsms 
+                ON node_events(cluster, node_name, ts_ms)
+            """)
+            
+            db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_recov_cluster_node_tsms 
+                ON recovery_attempts(cluster, node_name, ts_ms)
+            """)
+            
+            # Seed node_status_latest from history when it is still empty
+            if not db.execute("SELECT 1 FROM node_status_latest LIMIT 1").fetchone():
+                db.execute("""
+                    INSERT INTO node_status_latest 
+                    (cluster, node_name, slurm_state, is_available, timestamp, ts_ms)
+                    SELECT cluster, node_name, slurm_state, is_available, timestamp, ts_ms
+                    FROM node_status ns
+                    WHERE timestamp = (
+                        SELECT MAX(timestamp) FROM node_status WHERE cluster = ns.cluster
+                    )
+                """)
+            
+            # Roll up the existing history when node_status_hourly is new
+            if not db.execute("SELECT 1 FROM node_status_hourly LIMIT 1").fetchone():
+                db.execute(f"""
+                    INSERT INTO node_status_hourly 
+                    (cluster, node_name, bucket_ms, checks, down_checks)
+                    SELECT cluster, node_name, ts_ms - ts_ms % {HOURLY_BUCKET_MS},
+                           SUM(checks_covered), SUM(checks_covered * (1 - is_available))
+                    FROM node_status
+                    GROUP BY 1, 2, 3
+                """)
+            
+            # Count each history table once when it has no counter yet
+            for table in ('node_status', 'node_events', 'recovery_attempts'):
+                if not db.execute(
+                    "SELECT 1 FROM row_counts WHERE table_name = ?", (table,)
+                ).fetchone():
+                    db.execute(
+                        f"INSERT INTO row_counts (table_name, n) SELECT ?, COUNT(*) FROM {table}",
+                        (table,)
+                    )
+            
+            # Refresh planner statistics; analysis_limit samples each index
+            # so this stays cheap as the history grows
+            db.execute("PRAGMA analysis_limit=1000")
+            db.execute("ANALYZE")
+            
             self.logger.info(f"Database initialized at {self.db_path}")
         
         except Exception as e:
             self.logger.error(f"Error initializing database: {e}")
             raise
     
-    def check_cluster(self, cluster_name: str) -> Dict[str, Dict]:
+    def _ssh_prefix(self, cluster_name: str) -> str:
+        """
+        Build the ssh command prefix for a cluster's head node
+        
+        Args:
+            cluster_name: Name of cluster
+            
+        Returns:
+            ssh command up to and including user@head_node
+        """
+        return self.clusters[cluster_name].ssh_prefix
+    
+    def _ssh_command(self, cluster_name: str, command: str) -> str:
+        """
+        Build the local shell command that runs a command on a head node
+        
+        The remote command is passed as one shell-quoted word, so it reaches
+        the head node's shell exactly as written, nested quotes and all.
+        
+        Args:
+            cluster_name: Name of cluster
+            command: Command line to run on the head node
+            
+        Returns:
+            Complete ssh command line
+        """
+        return f"{self._ssh_prefix(cluster_name)} {shlex.quote(command)}"
+    
+    def check_cluster(self, cluster_name: str, max_age: float = SINFO_CACHE_TTL,
+                      since: float = 0.0) -> Dict[str, Dict]:
         """
         Check all nodes in a cluster using SLURM sinfo
         
         Args:
             cluster_name: Name of cluster ('spydur' or 'arachne')
+            max_age: Reuse a cached snapshot younger than this (seconds)
+            since: Only reuse a snapshot fetched at or after this
+                   time.monotonic() value
             
         Returns:
             Dictionary mapping node names to their status info
         """
+        started = time.monotonic()
+        cached = _SINFO_CACHE.get(cluster_name)
+        if cached and cached[0] >= since and started - cached[0] < max_age:
+            return cached[1]
+        
         cluster = self.clusters[cluster_name]
         self.logger.info(f"Checking cluster: {cluster_name}")
         
         # Build SSH command to run sinfo on the cluster
-        ssh_cmd = f"ssh {cluster['user']}@{cluster['head_node']} '{cluster['check_command']}'"
+        ssh_cmd = self._ssh_command(cluster_name, cluster.check_command)
         
         # Execute command using dorunrun
         result = dorunrun(ssh_cmd, return_datatype=str)
@@ -301,31 +638,39 @@ recovery_wait_time = 60
         node_statuses = {}
         
         if result.OK:
-            # Parse sinfo output
-            lines = result.value.strip().split('\n')
-            for line in lines:
-                if not line.strip():
+            # Parse sinfo output in one pass: "name,state" from the default
+            # check_command, or the space-separated "%N %T" of older configs
+            for line in result.value.splitlines():
+                parts = line.split(',', 1) if ',' in line else line.split(None, 1)
+                if len(parts) != 2:
                     continue
                 
-                parts = line.split()
-                if len(parts) >= 2:
-                    node_name = parts[0]
-                    slurm_state = parts[1].lower()
-                    
-                    # Determine if node is in problem state
-                    is_problem = any(prob_state in slurm_state for prob_state in cluster['problem_states'])
-                    
-                    node_statuses[node_name] = {
-                        'slurm_state': slurm_state,
-                        'is_available': not is_problem,
-                        'raw_line': line
-                    }
+                node_name, slurm_state = parts
+                slurm_state = slurm_state.strip().lower()
+                self.logger.debug("%s sinfo: %s", cluster_name, line)
+                
+                base_state = slurm_state.rstrip(SINFO_STATE_FLAGS)
+                if base_state in SINFO_STATE_NAMES:
+                    slurm_state = SINFO_STATE_NAMES[base_state] + slurm_state[len(base_state):]
+                
+                # Determine if node is in problem state
+                is_problem = any(
+                    cluster.problem_re.match(token)
+                    for token in slurm_state.rstrip(SINFO_STATE_FLAGS).split('+')
+                )
+                
+                node_statuses[node_name] = {
+                    'slurm_state': slurm_state,
+                    'is_available': not is_problem
+                }
+            
+            _SINFO_CACHE[cluster_name] = (started, node_statuses)
         else:
             self.logger.error(f"Failed to check {cluster_name}: {result.stderr}")
             # Log the error event
             self.log_event(
                 cluster_name,
-                cluster['head_node'],
+                cluster.head_node,
                 'check_failed',
                 f"Failed to run sinfo: {result.stderr}",
                 'error'
@@ -333,34 +678,137 @@ recovery_wait_time = 60
         
         return node_statuses
     
-    def log_status(self, cluster_name: str, node_statuses: Dict[str, Dict]) -> None:
+    def recheck_cluster(self, cluster_name: str, since: float) -> Dict[str, Dict]:
+        """
+        Re-read node states to verify a recovery, sharing one sinfo
+        snapshot between recoveries that finish close together
+        
+        Args:
+            cluster_name: Name of cluster
+            since: time.monotonic() when the caller started waiting; only
+                   snapshots fetched after it are used
+            
+        Returns:
+            Dictionary mapping node names to their status info
+        """
+        return self.check_cluster(cluster_name, RECHECK_MAX_AGE, since)
+    
+    def last_logged_statuses(self, cluster_name: str) -> Tuple[Dict[str, str], Optional[str]]:
+        """
+        Get the node states of the last snapshot written for a cluster
+        
+        Kept in memory once known; the first call of a process reads the
+        newest snapshot back from the database.
+        
+        Args:
+            cluster_name: Name of cluster
+            
+        Returns:
+            Tuple of ({node_name: slurm_state}, timestamp), or ({}, None)
+        """
+        if cluster_name not in self._last_statuses:
+            with self._db_lock:
+                rows = self._db.execute("""
+                    SELECT node_name, slurm_state, timestamp
+                    FROM node_status_latest
+                    WHERE cluster = ?
+                """, (cluster_name,)).fetchall()
+            self._last_statuses[cluster_name] = (
+                {row[0]: row[1] for row in rows},
+                rows[0][2] if rows else None
+            )
+        return self._last_statuses[cluster_name]
+    
+    def log_status(self, cluster_name: str, node_statuses: Dict[str, Dict],
+                   ts: Optional[str] = None) -> bool:
         """
         Log node statuses to database
         
+        The whole snapshot is skipped when every node is in the same state
+        as in the last written one, unless that is STATUS_HEARTBEAT_SECONDS
+        old; the check is then added to that snapshot's checks_covered, so
+        downtime sums of checks_covered still weigh states by how long they
+        lasted. Every written snapshot is complete, so "latest status"
+        queries still see all nodes of the cluster. node_status_latest is
+        replaced with the snapshot, and every check is counted in
+        node_status_hourly, in the same transaction.
+        
         Args:
             cluster_name: Name of cluster
             node_statuses: Dictionary of node statuses
+            ts: ISO timestamp to record (default: now)
+            
+        Returns:
+            True if the snapshot was written, False if it was unchanged
         """
-        timestamp = datetime.datetime.now().isoformat()
-        db = URdb(str(self.db_path))
+        timestamp = ts or datetime.datetime.now().isoformat()
         
-        for node_name, status_info in node_statuses.items():
-            db.execute("""
-                INSERT INTO node_status 
-                (timestamp, cluster, node_name, status, slurm_state, is_available, checked_from)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
+        states = {
+            node_name: status_info['slurm_state']
+            for node_name, status_info in node_statuses.items()
+        }
+        last_states, last_timestamp = self.last_logged_statuses(cluster_name)
+        unchanged = states == last_states and last_timestamp and (
+            datetime.datetime.fromisoformat(timestamp)
+            - datetime.datetime.fromisoformat(last_timestamp)
+        ).total_seconds() < STATUS_HEARTBEAT_SECONDS
+        
+        ts_ms = _ts_ms(timestamp)
+        bucket_ms = ts_ms - ts_ms % HOURLY_BUCKET_MS
+        hourly = [
+            (cluster_name, node_name, bucket_ms, 0 if status_info['is_available'] else 1)
+            for node_name, status_info in node_statuses.items()
+        ]
+        
+        if unchanged:
+            with self._db_lock, self._db.transaction():
+                self._db.execute(
+                    "UPDATE node_status SET checks_covered = checks_covered + 1 "
+                    "WHERE cluster = ? AND timestamp = ?",
+                    (cluster_name, last_timestamp)
+                )
+                self._db.executemany(UPSERT_NODE_STATUS_HOURLY, hourly)
+            return False
+        
+        rows = [
+            (
                 timestamp,
+                ts_ms,
                 cluster_name,
                 node_name,
                 'ok' if status_info['is_available'] else 'problem',
                 status_info['slurm_state'],
                 status_info['is_available'],
                 self.control_host
-            ))
+            )
+            for node_name, status_info in node_statuses.items()
+        ]
+        
+        # One transaction for the whole cluster; nodes that have left the
+        # cluster are dropped from node_status_latest
+        with self._db_lock, self._db.transaction():
+            self._db.executemany("""
+                INSERT INTO node_status 
+                (timestamp, ts_ms, cluster, node_name, status, slurm_state, is_available, checked_from)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._db.execute(UPDATE_ROW_COUNT, (len(rows), 'node_status'))
+            self._db.executemany("""
+                INSERT OR REPLACE INTO node_status_latest 
+                (cluster, node_name, slurm_state, is_available, timestamp, ts_ms)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(row[2], row[3], row[5], row[6], timestamp, ts_ms) for row in rows])
+            self._db.execute(
+                "DELETE FROM node_status_latest WHERE cluster = ? AND timestamp <> ?",
+                (cluster_name, timestamp)
+            )
+            self._db.executemany(UPSERT_NODE_STATUS_HOURLY, hourly)
+        
+        self._last_statuses[cluster_name] = (states, timestamp)
+        return True
     
     def log_event(self, cluster_name: str, node_name: str, event_type: str, 
-                  details: str, severity: str = 'info') -> None:
+                  details: str, severity: str = 'info', ts: Optional[str] = None) -> None:
         """
         Log a node event to database
         
@@ -370,15 +818,41 @@ recovery_wait_time = 60
             event_type: Type of event (e.g., 'down_detected', 'recovery_attempted')
             details: Event details
             severity: Severity level ('info', 'warning', 'error', 'critical')
+            ts: ISO timestamp to record (default: now)
         """
-        timestamp = datetime.datetime.now().isoformat()
-        db = URdb(str(self.db_path))
+        timestamp = ts or datetime.datetime.now().isoformat()
         
-        db.execute("""
-            INSERT INTO node_events 
-            (timestamp, cluster, node_name, event_type, details, severity)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (timestamp, cluster_name, node_name, event_type, details, severity))
+        with self._db_lock, self._db.transaction():
+            self._db.execute("""
+                INSERT INTO node_events 
+                (timestamp, ts_ms, cluster, node_name, event_type, details, severity)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (timestamp, _ts_ms(timestamp), cluster_name, node_name, event_type, details, severity))
+            self._db.execute(UPDATE_ROW_COUNT, (1, 'node_events'))
+    
+    def log_events(self, cluster_name: str, events: List[Tuple[str, str, str, str]],
+                   ts: Optional[str] = None) -> None:
+        """
+        Log several node events to database in one transaction
+        
+        Args:
+            cluster_name: Name of cluster
+            events: List of (node_name, event_type, details, severity) tuples
+            ts: ISO timestamp to record (default: now)
+        """
+        if not events:
+            return
+        
+        timestamp = ts or datetime.datetime.now().isoformat()
+        ts_ms = _ts_ms(timestamp)
+        
+        with self._db_lock, self._db.transaction():
+            self._db.executemany("""
+                INSERT INTO node_events 
+                (timestamp, ts_ms, cluster, node_name, event_type, details, severity)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [(timestamp, ts_ms, cluster_name, *event) for event in events])
+            self._db.execute(UPDATE_ROW_COUNT, (len(events), 'node_events'))
     
     def log_recovery_attempt(self, cluster_name: str, node_name: str, 
                            command: str, result) -> None:
@@ -392,21 +866,23 @@ recovery_wait_time = 60
             result: Result from dorunrun
         """
         timestamp = datetime.datetime.now().isoformat()
-        db = URdb(str(self.db_path))
-        
-        db.execute("""
-            INSERT INTO recovery_attempts 
-            (timestamp, cluster, node_name, command, exit_code, output, success)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            timestamp,
-            cluster_name,
-            node_name,
-            command,
-            result.exit_code if hasattr(result, 'exit_code') else None,
-            result.stdout if hasattr(result, 'stdout') else str(result),
-            result.OK
-        ))
+        
+        with self._db_lock, self._db.transaction():
+            self._db.execute("""
+                INSERT INTO recovery_attempts 
+                (timestamp, ts_ms, cluster, node_name, command, exit_code, output, success)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                timestamp,
+                _ts_ms(timestamp),
+                cluster_name,
+                node_name,
+                command,
+                result.exit_code if hasattr(result, 'exit_code') else None,
+                result.stdout if hasattr(result, 'stdout') else str(result),
+                result.OK
+            ))
+            self._db.execute(UPDATE_ROW_COUNT, (1, 'recovery_attempts'))
     
     def attempt_recovery(self, cluster_name: str, node_name: str) -> bool:
         """
@@ -432,17 +908,13 @@ recovery_wait_time = 60
         )
         
         # Try each recovery command in sequence
-        for cmd_template in cluster['recovery_commands']:
+        for cmd_template in cluster.recovery_commands:
             # Format command with node name
             command = cmd_template.format(node=node_name)
             
-            # Build full SSH command
-            if command.startswith('ssh'):
-                # Command already has SSH
-                full_cmd = f"ssh {cluster['user']}@{cluster['head_node']} \"{command.replace('ssh ' + node_name, '')}\""
-            else:
-                # Add SSH wrapper
-                full_cmd = f"ssh {cluster['user']}@{cluster['head_node']} '{command}'"
+            # Build full SSH command; commands that start with 'ssh {node}'
+            # hop from the head node on to the node itself
+            full_cmd = self._ssh_command(cluster_name, command)
             
             self.logger.info(f"Executing recovery command: {full_cmd}")
             
@@ -455,12 +927,18 @@ recovery_wait_time = 60
             if result.OK:
                 self.logger.info(f"Recovery command succeeded: {command}")
                 
-                # Wait a bit for node to come back
-                time.sleep(10)
+                # Poll with backoff until the node is back: a quick recovery
+                # is confirmed within a second, a slow one gets 15 s in total
+                is_back = False
+                for delay in RECOVERY_POLL_DELAYS:
+                    poll_start = time.monotonic()
+                    time.sleep(delay)
+                    node_statuses = self.recheck_cluster(cluster_name, poll_start)
+                    is_back = node_statuses.get(node_name, {}).get('is_available', False)
+                    if is_back:
+                        break
                 
-                # Check if node is back
-                node_statuses = self.check_cluster(cluster_name)
-                if node_name in node_statuses and node_statuses[node_name]['is_available']:
+                if is_back:
                     self.logger.info(f"Node {cluster_name}:{node_name} successfully recovered!")
                     self.log_event(
                         cluster_name,
@@ -521,16 +999,66 @@ Running on {self.control_host} as {os.getenv('USER', 'unknown')}
             
             msg.attach(MIMEText(full_body, 'plain'))
             
-            # Send email
-            with smtplib.SMTP(self.email_config['smtp_server'], 
-                            self.email_config['smtp_port']) as server:
-                server.send_message(msg)
-            
-            self.logger.info(f"Notification sent: {subject}")
+            self._mail_q.put((subject, msg))
         
         except Exception as e:
             self.logger.error(f"Failed to send notification: {e}")
     
+    def _mail_worker(self) -> None:
+        """
+        Send queued notifications, reusing one SMTP connection
+        
+        Runs until it takes None off the queue.
+        """
+        server = None
+        while True:
+            item = self._mail_q.get()
+            if item is None:
+                break
+            
+            subject, msg = item
+            for attempt in range(2):
+                try:
+                    if server is None:
+                        server = smtplib.SMTP(self.email_config['smtp_server'],
+                                              self.email_config['smtp_port'])
+                    server.send_message(msg)
+                    self.logger.info(f"Notification sent: {subject}")
+                    break
+                
+                except Exception as e:
+                    # The relay may have dropped an idle connection; retry
+                    # once on a fresh one
+                    with contextlib.suppress(Exception):
+                        server.close()
+                    server = None
+                    if attempt:
+                        self.logger.error(f"Failed to send notification: {e}")
+        
+        if server is not None:
+            with contextlib.suppress(Exception):
+                server.quit()
+    
+    def flush_notifications(self, timeout: Optional[float] = 60) -> None:
+        """
+        Wait for queued notifications to be sent and stop the mail thread
+        
+        Args:
+            timeout: Seconds to wait at most (None waits indefinitely)
+        """
+        if not self._mail_thread.is_alive():
+            return
+        
+        self._mail_q.put(None)
+        self._mail_thread.join(timeout)
+        if self._mail_thread.is_alive():
+            self.logger.error("Timed out sending notifications; some may be lost")
+    
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._db_lock:
+            self._db.close()
+    
     def monitor_all_clusters(self, attempt_recovery: bool = True) -> Dict[str, Any]:
         """
         Monitor all configured clusters
@@ -541,8 +1069,12 @@ Running on {self.control_host} as {os.getenv('USER', 'unknown')}
         Returns:
             Summary of monitoring run
         """
+        # One timestamp for every status row and detection event of this
+        # run, so a run's rows can be joined on it
+        tick_ts = datetime.datetime.now().isoformat()
+        
         summary = {
-            'timestamp': datetime.datetime.now().isoformat(),
+            'timestamp': tick_ts,
             'clusters': {},
             'total_nodes': 0,
             'healthy_nodes': 0,
@@ -551,73 +1083,89 @@ Running on {self.control_host} as {os.getenv('USER', 'unknown')}
             'failed_recovery': 0
         }
         
-        for cluster_name in ['spydur', 'arachne']:
-            self.logger.info(f"\n{'='*60}")
-            self.logger.info(f"Monitoring cluster: {cluster_name}")
-            self.logger.info(f"{'='*60}")
-            
-            # Check cluster
-            node_statuses = self.check_cluster(cluster_name)
-            
-            if not node_statuses:
-                self.logger.error(f"No node status data for {cluster_name}")
-                continue
-            
-            # Log statuses to database
-            self.log_status(cluster_name, node_statuses)
-            
-            # Analyze results
-            problem_nodes = []
-            healthy_nodes = []
+        # Run the sinfo checks of all clusters at once, so a run waits for
+        # the slowest SSH round-trip rather than the sum of them
+        with ThreadPoolExecutor(max_workers=len(self.clusters)) as executor:
+            futures = {
+                executor.submit(self.check_cluster, cluster_name): cluster_name
+                for cluster_name in self.clusters
+            }
             
-            for node_name, status_info in node_statuses.items():
-                summary['total_nodes'] += 1
+            for future in as_completed(futures):
+                cluster_name = futures[future]
+                node_statuses = future.result()
+                
+                self.logger.info(f"\n{'='*60}")
+                self.logger.info(f"Monitoring cluster: {cluster_name}")
+                self.logger.info(f"{'='*60}")
+                
+                if not node_statuses:
+                    self.logger.error(f"No node status data for {cluster_name}")
+                    continue
+                
+                # Analyze results
+                problem_nodes = []
+                healthy_nodes = []
+                events = []
                 
-                if status_info['is_available']:
-                    healthy_nodes.append(node_name)
-                    summary['healthy_nodes'] += 1
-                else:
-                    problem_nodes.append(node_name)
-                    summary['problem_nodes'] += 1
+                for node_name, status_info in node_statuses.items():
+                    summary['total_nodes'] += 1
                     
-                    # Log the problem
-                    self.log_event(
-                        cluster_name,
-                        node_name,
-                        'node_down',
-                        f"Node in problematic state: {status_info['slurm_state']}",
-                        'warning'
-                    )
-            
-            # Store cluster summary
-            summary['clusters'][cluster_name] = {
-                'total': len(node_statuses),
-                'healthy': len(healthy_nodes),
-                'problem': len(problem_nodes),
-                'problem_nodes': problem_nodes
-            }
-            
-            self.logger.info(f"Cluster {cluster_name} summary:")
-            self.logger.info(f"  Total nodes: {len(node_statuses)}")
-            self.logger.info(f"  Healthy: {len(healthy_nodes)}")
-            self.logger.info(f"  Problems: {len(problem_nodes)}")
-            
-            if problem_nodes:
-                self.logger.warning(f"  Problem nodes: {', '.join(problem_nodes)}")
+                    if status_info['is_available']:
+                        healthy_nodes.append(node_name)
+                        summary['healthy_nodes'] += 1
+                    else:
+                        problem_nodes.append(node_name)
+                        summary['problem_nodes'] += 1
+                        
+                        # Log the problem
+                        events.append((
+                            node_name,
+                            'node_down',
+                            f"Node in problematic state: {status_info['slurm_state']}",
+                            'warning'
+                        ))
                 
-                # Attempt recovery if enabled
-                if attempt_recovery:
-                    for node_name in problem_nodes:
-                        self.logger.info(f"\nAttempting recovery for {node_name}...")
-                        if self.attempt_recovery(cluster_name, node_name):
-                            summary['recovered_nodes'] += 1
-                        else:
-                            summary['failed_recovery'] += 1
+                # Statuses (counted against the last snapshot if nothing
+                # changed) and detection events
+                # of the cluster go in as one transaction
+                with self._db_lock, self._db.transaction():
+                    if not self.log_status(cluster_name, node_statuses, ts=tick_ts):
+                        self.logger.info(f"No state changes on {cluster_name}; check added to the last snapshot")
+                    self.log_events(cluster_name, events, ts=tick_ts)
                 
-                # Send notification for problem nodes
-                self.send_notification(
-                    f"Cluster {cluster_name}: {len(problem_nodes)} node(s) down",
-                    f"""Problem nodes detected on {cluster_name}:
+                # Store cluster summary
+                summary['clusters'][cluster_name] = {
+                    'total': len(node_statuses),
+                    'healthy': len(healthy_nodes),
+                    'problem': len(problem_nodes),
+                    'problem_nodes': problem_nodes
+                }
+                
+                self.logger.info(f"Cluster {cluster_name} summary:")
+                self.logger.info(f"  Total nodes: {len(node_statuses)}")
+                self.logger.info(f"  Healthy: {len(healthy_nodes)}")
+                self.logger.info(f"  Problems: {len(problem_nodes)}")
+                
+                if problem_nodes:
+                    self.logger.warning(f"  Problem nodes: {', '.join(problem_nodes)}")
+                    
+                    # Attempt recovery if enabled; nodes are independent, so
+                    # recover them side by side
+                    if attempt_recovery:
+                        self.logger.info(f"\nAttempting recovery for {', '.join(problem_nodes)}...")
+                        with ThreadPoolExecutor(max_workers=min(8, len(problem_nodes))) as pool:
+                            recovered = list(pool.map(
+                                lambda node_name: self.attempt_recovery(cluster_name, node_name),
+                                problem_nodes
+                            ))
+                        summary['recovered_nodes'] += sum(recovered)
+                        summary['failed_recovery'] += len(recovered) - sum(recovered)
+                    
+                    # Send notification for problem nodes
+                    self.send_notification(
+                        f"Cluster {cluster_name}: {len(problem_nodes)} node(s) down",
+                        f"""Problem nodes detected on {cluster_name}:
 
 {chr(10).join([f"  - {node}: {node_statuses[node]['slurm_state']}" for node in problem_nodes])}
 
@@ -625,8 +1173,8 @@ Recovery attempted: {attempt_recovery}
 Recovered: {summary['recovered_nodes']}
 Failed: {summary['failed_recovery']}
 """,
-                    severity='critical' if len(problem_nodes) > 3 else 'warning'
-                )
+                        severity='critical' if len(problem_nodes) > 3 else 'warning'
+                    )
         
         return summary
     
@@ -640,29 +1188,14 @@ Failed: {summary['failed_recovery']}
         Returns:
             Formatted report string
         """
-        db = URdb(str(self.db_path))
-        
-        cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
-        
-        # Get node events
-        events = db.execute("""
-            SELECT cluster, node_name, event_type, COUNT(*) as count
-            FROM node_events
-            WHERE timestamp > ? AND severity IN ('warning', 'error', 'critical')
-            GROUP BY cluster, node_name, event_type
-            ORDER BY count DESC
-        """, (cutoff_date,)).fetchall()
-        
-        # Get recovery stats
-        recovery_stats = db.execute("""
-            SELECT cluster, success, COUNT(*) as count
-            FROM recovery_attempts
-            WHERE timestamp > ?
-            GROUP BY cluster, success
-        """, (cutoff_date,)).fetchall()
-        
-        # Build report
-        report = f"""
+        # Read-only, so the report can never take a write lock away from
+        # a running monitor
+        db = URdb(str(self.db_path), read_only=True)
+        
+        cutoff_ms = round((time.time() - days * 86400) * 1000)
+        
+        report = io.StringIO()
+        report.write(f"""
 CLUSTER NODE MONITOR - STATUS REPORT
 =====================================
 Period: Last {days} days
@@ -670,24 +1203,47 @@ Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 NODE EVENTS SUMMARY
 -------------------
-"""
+""")
         
-        if events:
+        try:
+            # Get node events, written out as they are fetched
+            events = db.execute("""
+                SELECT cluster, node_name, event_type, COUNT(*) as count
+                FROM node_events
+                WHERE ts_ms > ? AND severity IN ('warning', 'error', 'critical')
+                GROUP BY cluster, node_name, event_type
+                ORDER BY count DESC
+            """, (cutoff_ms,))
+            
+            found = False
             for event in events:
-                report += f"{event[0]:10} {event[1]:15} {event[2]:20} {event[3]:5} times\n"
-        else:
-            report += "No events recorded\n"
-        
-        report += "\nRECOVERY ATTEMPTS\n-----------------\n"
-        
-        if recovery_stats:
+                report.write(f"{event[0]:10} {event[1]:15} {event[2]:20} {event[3]:5} times\n")
+                found = True
+            if not found:
+                report.write("No events recorded\n")
+            
+            report.write("\nRECOVERY ATTEMPTS\n-----------------\n")
+            
+            # Get recovery stats
+            recovery_stats = db.execute("""
+                SELECT cluster, success, COUNT(*) as count
+                FROM recovery_attempts
+                WHERE ts_ms > ?
+                GROUP BY cluster, success
+            """, (cutoff_ms,))
+            
+            found = False
             for stat in recovery_stats:
                 status = "Success" if stat[1] else "Failed"
-                report += f"{stat[0]:10} {status:10} {stat[2]:5} attempts\n"
-        else:
-            report += "No recovery attempts\n"
+                report.write(f"{stat[0]:10} {status:10} {stat[2]:5} attempts\n")
+                found = True
+            if not found:
+                report.write("No recovery attempts\n")
+        
+        finally:
+            db.close()
         
-        return report
+        return report.getvalue()
 
 
 def main():
@@ -776,6 +1332,10 @@ Examples:
         print(f"ERROR: {e}", file=sys.stderr)
         return os.EX_SOFTWARE
     
+    finally:
+        monitor.flush_notifications()
+        monitor.close()
+    
     return os.EX_OK
 
 
@@ -9,18 +9,162 @@ from typing import *
 
 import os
 import sys
+import locale
+import re
+import selectors
 import subprocess
 import shlex
+import threading
+import time
+import uuid
+import warnings
 from collections import namedtuple
 
 # Result tuple for command execution
 ExitCode = namedtuple('ExitCode', ['OK', 'exit_code', 'value', 'stdout', 'stderr'])
 
 
+class _ShellWorker:
+    """
+    A long-lived bash that runs commands fed to it on stdin
+    
+    Each command is followed by sentinels on stdout (carrying $?) and on
+    stderr, so its output can be read back without starting a process.
+    Commands run in the worker's own shell: cd, variables and the like
+    persist between calls. A command that exits the shell returns that
+    exit code and the next call starts a new worker.
+    
+    The command is passed to eval as one quoted word, so a syntax error
+    (an unbalanced quote, say) fails that eval with exit code 2 instead of
+    swallowing the sentinels. A command that outlives its timeout gets the
+    worker killed; the next call starts a new one.
+    """
+    
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            ['/bin/bash'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        self.lock = threading.Lock()
+    
+    def alive(self) -> bool:
+        """True while the bash process is running"""
+        return self.proc.poll() is None
+    
+    def run(self, command: str, timeout: Optional[float] = None) -> Tuple[int, str, str]:
+        """
+        Run one command in the worker shell
+        
+        Args:
+            command: Shell command to execute
+            timeout: Seconds to wait for the command (None waits indefinitely)
+            
+        Returns:
+            Tuple of (exit_code, stdout as bytes, stderr as str)
+            
+        Raises:
+            subprocess.TimeoutExpired: The command did not finish in time
+        """
+        token = uuid.uuid4().hex
+        rc_end = re.compile(rb'\n__RC_(\d+)_' + token.encode() + rb'__\n$')
+        err_end = f"\n{token}\n".encode()
+        
+        # stdin of the command is /dev/null, or it would read the rest of
+        # the script off the worker's stdin
+        script = (
+            f"{{ eval {shlex.quote(command)}\n}} </dev/null\n"
+            f"printf '\\n__RC_%d_{token}__\\n' $?\n"
+            f"printf '\\n{token}\\n' >&2\n"
+        )
+        
+        deadline = None if timeout is None else time.monotonic() + timeout
+        
+        with self.lock:
+            self.proc.stdin.write(script.encode())
+            self.proc.stdin.flush()
+            
+            # Drain both pipes together, so neither can fill up and stall
+            out, err = bytearray(), bytearray()
+            done = {self.proc.stdout: False, self.proc.stderr: False}
+            with selectors.DefaultSelector() as sel:
+                for stream in done:
+                    sel.register(stream, selectors.EVENT_READ)
+                while not all(done.values()):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    events = sel.select(remaining) if remaining is None or remaining > 0 else []
+                    if not events:
+                        self.proc.kill()
+                        self.proc.wait()
+                        raise subprocess.TimeoutExpired(command, timeout)
+                    for key, _ in events:
+                        chunk = os.read(key.fileobj.fileno(), 65536)
+                        buf = out if key.fileobj is self.proc.stdout else err
+                        if not chunk:
+                            # The command exited the shell
+                            sel.unregister(key.fileobj)
+                            done[key.fileobj] = True
+                            continue
+                        buf += chunk
+                        if key.fileobj is self.proc.stdout:
+                            done[key.fileobj] = rc_end.search(out[-80:]) is not None
+                        else:
+                            done[key.fileobj] = err.endswith(err_end)
+        
+        encoding = locale.getpreferredencoding(False)
+        match = rc_end.search(out)
+        if match is None:
+            exit_code = self.proc.wait()
+        else:
+            exit_code = int(match.group(1))
+            del out[match.start():]
+            del err[-len(err_end):]
+        
+        return exit_code, bytes(out), err.decode(encoding, errors='replace')
+
+
+_shell_worker = None
+_shell_worker_lock = threading.Lock()
+
+
+def _get_shell_worker() -> _ShellWorker:
+    """Get the process's shell worker, starting a new one if needed"""
+    global _shell_worker
+    with _shell_worker_lock:
+        if _shell_worker is None or not _shell_worker.alive():
+            _shell_worker = _ShellWorker()
+        return _shell_worker
+
+
+def _convert(stdout: str, return_datatype: type) -> Any:
+    """Convert command output to the requested datatype"""
+    if return_datatype == str:
+        return stdout
+    elif return_datatype == bytes:
+        return stdout.encode() if isinstance(stdout, str) else stdout
+    elif return_datatype == list:
+        return stdout.splitlines() if stdout else []
+    elif return_datatype == int:
+        try:
+            return int(stdout.strip()) if stdout.strip() else 0
+        except ValueError:
+            return 0
+    elif return_datatype == float:
+        try:
+            return float(stdout.strip()) if stdout.strip() else 0.0
+        except ValueError:
+            return 0.0
+    else:
+        return stdout
+
+
 def dorunrun(command: str, 
              timeout: int = None,
              return_datatype: type = str,
              input_data: str = None,
+             persistent: bool = False,
+             capture: bool = True,
              **kwargs) -> ExitCode:
     """
     Execute a shell command and return structured results.
@@ -30,17 +174,43 @@ def dorunrun(command: str,
         timeout: Command timeout in seconds
         return_datatype: Type to return (str, bytes, list, etc.)
         input_data: Data to send to stdin
-        **kwargs: Additional arguments passed to subprocess.run
+        persistent: Run a string command in a long-lived bash instead of a
+            new process; ignored when input_data or kwargs are given
+        capture: Collect stdout and stderr; if False both are discarded,
+            value is None and stdout/stderr are empty
+        **kwargs: Additional arguments passed to subprocess.run; avoid
+            preexec_fn, which keeps subprocess from using vfork
         
     Returns:
         ExitCode namedtuple with:
             - OK: True if exit_code == 0
             - exit_code: Command exit code
             - value: stdout content (converted to return_datatype)
-            - stdout: Raw stdout
+            - stdout: Raw stdout (bytes if return_datatype is bytes)
             - stderr: Raw stderr
     """
+    if kwargs.get('preexec_fn') is not None:
+        warnings.warn("dorunrun: preexec_fn forces a full fork per command; "
+                      "prefer start_new_session, process_group or umask",
+                      RuntimeWarning, stacklevel=2)
+    
     try:
+        if (persistent and isinstance(command, str)
+                and input_data is None and not kwargs):
+            exit_code, stdout, stderr = _get_shell_worker().run(command, timeout)
+            if return_datatype != bytes:
+                stdout = stdout.decode(locale.getpreferredencoding(False), errors='replace')
+            if not capture:
+                return ExitCode(OK=(exit_code == 0), exit_code=exit_code,
+                                value=None, stdout="", stderr="")
+            return ExitCode(
+                OK=(exit_code == 0),
+                exit_code=exit_code,
+                value=_convert(stdout, return_datatype),
+                stdout=stdout,
+                stderr=stderr
+            )
+        
         # Handle string vs list command
         if isinstance(command, str):
             # Use shell=True for string commands
@@ -51,6 +221,45 @@ def dorunrun(command: str,
             shell = False
             cmd = command
         
+        if not capture:
+            # No pipes to set up and read when nobody wants the output
+            result = subprocess.run(
+                cmd,
+                shell=shell,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                timeout=timeout,
+                input=input_data,
+                **kwargs
+            )
+            return ExitCode(
+                OK=(result.returncode == 0),
+                exit_code=result.returncode,
+                value=None,
+                stdout="",
+                stderr=""
+            )
+        
+        if return_datatype == bytes:
+            # Keep stdout as the bytes the command wrote, rather than
+            # decoding it only to encode it again
+            result = subprocess.run(
+                cmd,
+                shell=shell,
+                capture_output=True,
+                timeout=timeout,
+                input=input_data.encode() if isinstance(input_data, str) else input_data,
+                **kwargs
+            )
+            return ExitCode(
+                OK=(result.returncode == 0),
+                exit_code=result.returncode,
+                value=result.stdout,
+                stdout=result.stdout,
+                stderr=os.fsdecode(result.stderr)
+            )
+        
         # Execute command
         result = subprocess.run(
             cmd,
@@ -63,24 +272,7 @@ def dorunrun(command: str,
         )
         
         # Convert output to requested datatype
-        if return_datatype == str:
-            value = result.stdout
-        elif return_datatype == bytes:
-            value = result.stdout.encode() if isinstance(result.stdout, str) else result.stdout
-        elif return_datatype == list:
-            value = result.stdout.splitlines() if result.stdout else []
-        elif return_datatype == int:
-            try:
-                value = int(result.stdout.strip()) if result.stdout.strip() else 0
-            except ValueError:
-                value = 0
-        elif return_datatype == float:
-            try:
-                value = float(result.stdout.strip()) if result.stdout.strip() else 0.0
-            except ValueError:
-                value = 0.0
-        else:
-            value = result.stdout
+        value = _convert(result.stdout, return_datatype)
         
         return ExitCode(
             OK=(result.returncode == 0),
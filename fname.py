@@ -9,25 +9,46 @@ from typing import *
 
 import os
 import sys
+import functools
 from pathlib import Path
 
 
 class Fname:
     """Filename and path utilities"""
     
-    def __init__(self, filepath: str):
+    def __init__(self, filepath: str, resolve: bool = False):
         """
         Initialize with a file path
         
         Args:
             filepath: Path to file (usually __file__)
+            resolve: Follow symlinks to the real path; otherwise the path
+                is only made absolute, which needs no filesystem lookups
         """
-        self.path = Path(filepath).resolve()
-        self.fullpath = str(self.path)
-        self.directory = str(self.path.parent)
-        self.filename = self.path.name
-        self.basename = self.path.stem
-        self.extension = self.path.suffix
+        self._raw = os.fspath(filepath)
+        self._resolve = resolve
+        
+        # Name parts are plain string operations; the filesystem is only
+        # consulted once path, fullpath or directory is used
+        self.filename = os.path.basename(os.path.normpath(self._raw))
+        self.basename, self.extension = os.path.splitext(self.filename)
+    
+    @functools.cached_property
+    def path(self) -> Path:
+        """Absolute path, with symlinks followed if resolve was given"""
+        if self._resolve:
+            return Path(self._raw).resolve()
+        return Path(os.path.abspath(self._raw))
+    
+    @functools.cached_property
+    def fullpath(self) -> str:
+        """Absolute path as a string"""
+        return str(self.path)
+    
+    @functools.cached_property
+    def directory(self) -> str:
+        """Directory containing the file"""
+        return str(self.path.parent)
     
     def __str__(self):
         """String representation"""
@@ -16,10 +16,46 @@ if sys.version_info < min_py:
     sys.exit(os.EX_SOFTWARE)
 
 import re
+import shlex
+import shutil
 import subprocess
+import time
 from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
+# One pending job, in squeue's -o '%i|%P|%j|%u|%r|%R' field order
+Job = namedtuple('Job', ['jobid', 'partition', 'name', 'user', 'reason', 'nodelist'])
+
+# Looked up in PATH once, not by every run_command
+SSH_BIN = shutil.which('ssh') or '/usr/bin/ssh'
+
+# Multiplex every ssh to a head node over one persistent master connection,
+# the same socket cluster_node_monitor uses
+SSH_OPTIONS = (
+    '-o', 'BatchMode=yes',
+    '-o', 'ControlMaster=auto',
+    '-o', 'ControlPath=~/.ssh/cm-%r@%h:%p',
+    '-o', 'ControlPersist=600',
+)
+
+# Node states under which a "nodes DOWN/DRAINED" reason is accurate
+DOWN_STATES = frozenset(['down', 'drained', 'draining', 'fail'])
+
+# The scontrol show node fields get_node_resources reads
+NODE_FIELDS = frozenset(['NodeName', 'State', 'CPUAlloc', 'CPUTot',
+                         'RealMemory', 'AllocMem', 'Gres'])
+
+# get_node_resources answers a repeated query for the same nodes from its
+# cache for this long (seconds)
+NODE_RESOURCES_TTL = 30.0
+
+# One item of a hostlist, e.g. node[01-03,07] or login1 in
+# "node[01-03,07],gpu[1-2],login1"
+_RE_HOSTLIST_ITEM = re.compile(r'([^,\[\]]+)(?:\[([0-9,-]+)\])?')
+
+# Printed after each hostlist when expanding several in one ssh call
+HOSTLIST_SEPARATOR = '--'
 
 class JobQueueAnalyzer:
     """Analyze SLURM job queue for misleading status messages"""
@@ -36,126 +72,127 @@ class JobQueueAnalyzer:
         self.cluster = cluster
         self.user = user
         self.head_node = head_node
-        self.ssh_prefix = f"ssh {user}@{head_node}"
+        self.ssh_prefix = [SSH_BIN, *SSH_OPTIONS, f"{user}@{head_node}"]
+        
+        # tuple(sorted(nodes)) -> (time.monotonic() when fetched, resources)
+        self._resource_cache = {}
+        
+        # hostlist expression -> node names, as expanded by scontrol
+        self._hostlists = {}
     
     def run_command(self, command: str) -> Tuple[int, str, str]:
         """Run SSH command on cluster"""
-        full_cmd = f"{self.ssh_prefix} '{command}'"
+        # No local shell: the command reaches the remote shell as written
         result = subprocess.run(
-            full_cmd,
-            shell=True,
+            [*self.ssh_prefix, command],
             capture_output=True,
             text=True,
             timeout=30
         )
         return result.returncode, result.stdout, result.stderr
     
-    def get_queue_jobs(self) -> List[Dict[str, str]]:
-        """Get all pending jobs with reason codes"""
+    def get_queue_jobs(self) -> Iterator[Job]:
+        """Get all pending jobs with reason codes, one at a time"""
         # Get pending jobs with detailed reason
         cmd = "squeue -t PD -o '%i|%P|%j|%u|%r|%R' --noheader"
         rc, stdout, stderr = self.run_command(cmd)
         
         if rc != 0:
-            return []
+            return
         
-        jobs = []
-        for line in stdout.strip().split('\n'):
+        for line in stdout.splitlines():
             if not line:
                 continue
             
-            parts = line.split('|')
+            parts = line.split('|', 5)
             if len(parts) < 6:
                 continue
             
-            job = {
-                'jobid': parts[0].strip(),
-                'partition': parts[1].strip(),
-                'name': parts[2].strip(),
-                'user': parts[3].strip(),
-                'reason': parts[4].strip(),
-                'nodelist': parts[5].strip()
-            }
-            jobs.append(job)
-        
-        return jobs
+            yield Job(*(part.strip() for part in parts))
     
     def get_node_resources(self, nodes: List[str]) -> Dict[str, Dict]:
         """Get current resource usage for nodes"""
         if not nodes:
             return {}
         
-        node_list = ','.join(nodes)
+        key = tuple(sorted(nodes))
+        cached = self._resource_cache.get(key)
+        if cached and time.monotonic() - cached[0] < NODE_RESOURCES_TTL:
+            return cached[1]
+        
+        fetched = time.monotonic()
+        node_list = ','.join(key)
         cmd = f"scontrol show node {node_list}"
         rc, stdout, stderr = self.run_command(cmd)
         
         if rc != 0:
             return {}
         
-        resources = {}
-        current_node = None
+        # scontrol prints KEY=VALUE tokens; a node's record starts at its
+        # NodeName= token, whether records span lines or not
+        records = []
+        for token in stdout.split():
+            field, _, value = token.partition('=')
+            if field not in NODE_FIELDS:
+                continue
+            if field == 'NodeName':
+                records.append({})
+            if records:
+                records[-1][field] = value
         
-        for line in stdout.split('\n'):
-            line = line.strip()
-            if line.startswith('NodeName='):
-                # Extract node name
-                match = re.search(r'NodeName=(\S+)', line)
-                if match:
-                    current_node = match.group(1)
-                    resources[current_node] = {
-                        'state': 'unknown',
-                        'cpus_total': 0,
-                        'cpus_alloc': 0,
-                        'gpus_total': 0,
-                        'gpus_alloc': 0,
-                        'mem_total': 0,
-                        'mem_alloc': 0
-                    }
-                
-                # Extract state
-                match = re.search(r'State=(\S+)', line)
-                if match and current_node:
-                    resources[current_node]['state'] = match.group(1).lower()
-            
-            elif current_node and 'CPUAlloc=' in line:
-                # Extract CPU info
-                match = re.search(r'CPUAlloc=(\d+)', line)
-                if match:
-                    resources[current_node]['cpus_alloc'] = int(match.group(1))
-                
-                match = re.search(r'CPUTot=(\d+)', line)
-                if match:
-                    resources[current_node]['cpus_total'] = int(match.group(1))
-            
-            elif current_node and 'AllocMem=' in line:
-                # Extract memory info
-                match = re.search(r'AllocMem=(\d+)', line)
-                if match:
-                    resources[current_node]['mem_alloc'] = int(match.group(1))
-                
-                match = re.search(r'RealMemory=(\d+)', line)
-                if match:
-                    resources[current_node]['mem_total'] = int(match.group(1))
-            
-            elif current_node and 'Gres=' in line:
-                # Extract GPU info if present
-                match = re.search(r'gpu:(\d+)', line)
-                if match:
-                    resources[current_node]['gpus_total'] = int(match.group(1))
+        resources = {}
+        for tokens in records:
+            resources[tokens['NodeName']] = {
+                'state': tokens.get('State', 'unknown').lower(),
+                'cpus_total': self._to_int(tokens.get('CPUTot')),
+                'cpus_alloc': self._to_int(tokens.get('CPUAlloc')),
+                'gpus_total': self._gpu_count(tokens.get('Gres', '')),
+                'gpus_alloc': 0,
+                'mem_total': self._to_int(tokens.get('RealMemory')),
+                'mem_alloc': self._to_int(tokens.get('AllocMem'))
+            }
         
+        self._resource_cache[key] = (fetched, resources)
         return resources
     
-    def analyze_job(self, job: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _blames_nodes(reason: str) -> bool:
+        """True if a pending reason blames DOWN or DRAINED nodes"""
+        # Two substring tests beat a compiled DOWN|DRAIN regex here, and a
+        # fixed set of reason codes would miss reworded Slurm messages
+        return 'DOWN' in reason or 'DRAIN' in reason
+    
+    @staticmethod
+    def _to_int(value: Optional[str]) -> int:
+        """Integer value of an scontrol field, 0 if missing or not a number"""
+        return int(value) if value and value.isdigit() else 0
+    
+    @staticmethod
+    def _gpu_count(gres: str) -> int:
+        """Total GPUs in a Gres field such as gpu:2(S:0-1) or gpu:a100:4"""
+        total = 0
+        for item in gres.split(','):
+            if item.startswith('gpu:'):
+                total += JobQueueAnalyzer._to_int(item.split('(', 1)[0].rsplit(':', 1)[1])
+        return total
+    
+    def analyze_job(self, job: Job,
+                    resources: Optional[Dict[str, Dict]] = None) -> Optional[Dict[str, Any]]:
         """
         Analyze a job to detect misleading status
         
+        Args:
+            job: Job from get_queue_jobs
+            resources: Node resources already fetched for several jobs;
+                queried for this job's nodes alone if not given
+        
         Returns dict with analysis or None if status is accurate
         """
-        reason = job['reason']
-        nodelist = job['nodelist']
+        reason = job.reason
+        nodelist = job.nodelist
         
         # Only analyze jobs with "nodes DOWN/DRAINED" message
-        if 'DOWN' not in reason and 'DRAIN' not in reason:
+        if not self._blames_nodes(reason):
             return None
         
         # Extract node names from nodelist (if present)
@@ -164,7 +201,10 @@ class JobQueueAnalyzer:
             return None
         
         # Check actual node resources
-        resources = self.get_node_resources(nodes)
+        if resources is None:
+            resources = self.get_node_resources(nodes)
+        else:
+            resources = {node: resources[node] for node in nodes if node in resources}
         if not resources:
             return None
         
@@ -181,21 +221,61 @@ class JobQueueAnalyzer:
         
         return None
     
+    def expand_hostlists(self, nodelists: Iterable[str]) -> None:
+        """
+        Expand bracketed hostlists with scontrol show hostnames
+        
+        All expressions go to the head node in one ssh call; the results are
+        kept for _extract_nodes. Expressions scontrol cannot expand are left
+        to its local parser.
+        
+        Args:
+            nodelists: Nodelist strings as squeue prints them
+        """
+        pending = sorted({
+            nodelist for nodelist in nodelists
+            if '[' in nodelist and not nodelist.startswith('(')
+            and nodelist not in self._hostlists
+        })
+        if not pending:
+            return
+        
+        cmd = '; '.join(
+            f"scontrol show hostnames {shlex.quote(nodelist)}; echo {HOSTLIST_SEPARATOR}"
+            for nodelist in pending
+        )
+        rc, stdout, stderr = self.run_command(cmd)
+        if rc != 0:
+            return
+        
+        groups = stdout.split(f"{HOSTLIST_SEPARATOR}\n")
+        if len(groups) != len(pending) + 1:
+            return
+        
+        for nodelist, group in zip(pending, groups):
+            nodes = group.split()
+            if nodes:
+                self._hostlists[nodelist] = nodes
+    
     def _extract_nodes(self, nodelist: str) -> List[str]:
         """Extract individual node names from nodelist string"""
-        # Handle formats like: node[01-03] or node01,node02
-        nodes = []
+        if nodelist in self._hostlists:
+            return list(self._hostlists[nodelist])
         
-        # Simple comma-separated list
-        if ',' in nodelist and '[' not in nodelist:
-            return [n.strip() for n in nodelist.split(',')]
+        # Handle formats like: node[01-03,07],gpu[1-2] or node01,node02
+        nodes = []
+        if not nodelist or nodelist.startswith('('):
+            return nodes
         
-        # Expanded range format: node[01-03]
-        match = re.match(r'(\w+)\[([0-9,-]+)\]', nodelist)
-        if match:
-            prefix = match.group(1)
+        for match in _RE_HOSTLIST_ITEM.finditer(nodelist):
+            prefix = match.group(1).strip()
             ranges = match.group(2)
             
+            if ranges is None:
+                # Single node or simple name
+                nodes.append(prefix)
+                continue
+            
             for part in ranges.split(','):
                 if '-' in part:
                     start, end = part.split('-')
@@ -206,93 +286,74 @@ class JobQueueAnalyzer:
                 else:
                     nodes.append(f"{prefix}{part}")
         
-        elif nodelist and not nodelist.startswith('('):
-            # Single node or simple name
-            nodes = [nodelist]
-        
         return nodes
     
     def _diagnose_resources(self, resources: Dict[str, Dict]) -> Dict:
         """Diagnose actual resource constraints"""
-        all_down = True
-        all_cpus_full = True
-        all_gpus_full = True
-        all_mem_full = True
-        
-        cpu_details = []
-        gpu_details = []
-        mem_details = []
+        # Check if nodes are actually down; then the message is accurate
+        if all(res['state'] in DOWN_STATES for res in resources.values()):
+            return {'misleading': False}
         
-        for node, res in resources.items():
-            state = res['state']
-            
-            # Check if node is actually down
-            if state not in ['down', 'drained', 'draining', 'fail']:
-                all_down = False
-            
-            # Check CPU availability
-            if res['cpus_total'] > 0:
-                cpu_avail = res['cpus_total'] - res['cpus_alloc']
-                if cpu_avail > 0:
-                    all_cpus_full = False
-                cpu_details.append(f"{node}: {cpu_avail}/{res['cpus_total']} CPUs free")
-            
-            # Check GPU availability
-            if res['gpus_total'] > 0:
-                # For now, assume if GPUs exist, check if any job can get them
-                # (more complex logic would check AllocTRES)
-                gpu_details.append(f"{node}: {res['gpus_total']} GPUs")
-            
-            # Check memory availability
-            if res['mem_total'] > 0:
-                mem_avail = res['mem_total'] - res['mem_alloc']
-                if mem_avail > 1000:  # >1GB available
-                    all_mem_full = False
-                mem_details.append(f"{node}: {mem_avail}MB/{res['mem_total']}MB free")
+        # One column per resource, over the nodes that have it
+        cpus = [(node, res['cpus_total'] - res['cpus_alloc'], res['cpus_total'])
+                for node, res in resources.items() if res['cpus_total'] > 0]
+        gpus = [(node, res['gpus_total'])
+                for node, res in resources.items() if res['gpus_total'] > 0]
+        mem = [(node, res['mem_total'] - res['mem_alloc'], res['mem_total'])
+               for node, res in resources.items() if res['mem_total'] > 0]
         
-        # Determine if message is misleading
-        misleading = not all_down
-        
-        if misleading:
-            # Figure out real reason
-            if all_cpus_full:
-                return {
-                    'misleading': True,
-                    'reason': 'CPUs fully allocated',
-                    'details': cpu_details
-                }
-            elif all_gpus_full and gpu_details:
-                return {
-                    'misleading': True,
-                    'reason': 'GPUs fully allocated',
-                    'details': gpu_details
-                }
-            elif all_mem_full:
-                return {
-                    'misleading': True,
-                    'reason': 'Memory fully allocated',
-                    'details': mem_details
-                }
-            else:
-                return {
-                    'misleading': True,
-                    'reason': 'Resources busy (partition/priority)',
-                    'details': ['Nodes available but allocated to higher priority jobs']
-                }
-        
-        return {'misleading': False}
+        # Figure out real reason; only its details are formatted
+        if all(avail <= 0 for _, avail, _ in cpus):
+            return {
+                'misleading': True,
+                'reason': 'CPUs fully allocated',
+                'details': [f"{node}: {avail}/{total} CPUs free" for node, avail, total in cpus]
+            }
+        elif gpus:
+            # For now, assume if GPUs exist, check if any job can get them
+            # (more complex logic would check AllocTRES)
+            return {
+                'misleading': True,
+                'reason': 'GPUs fully allocated',
+                'details': [f"{node}: {total} GPUs" for node, total in gpus]
+            }
+        elif all(avail <= 1000 for _, avail, _ in mem):  # <=1GB available
+            return {
+                'misleading': True,
+                'reason': 'Memory fully allocated',
+                'details': [f"{node}: {avail}MB/{total}MB free" for node, avail, total in mem]
+            }
+        else:
+            return {
+                'misleading': True,
+                'reason': 'Resources busy (partition/priority)',
+                'details': ['Nodes available but allocated to higher priority jobs']
+            }
     
     def analyze_queue(self) -> List[Dict]:
         """Analyze entire queue for misleading statuses"""
-        jobs = self.get_queue_jobs()
-        misleading = []
+        # Only jobs blamed on DOWN/DRAIN nodes can be misleading, so only
+        # those are kept. One scontrol call covers all their nodes.
+        candidates = [
+            job for job in self.get_queue_jobs()
+            if self._blames_nodes(job.reason)
+        ]
+        self.expand_hostlists(job.nodelist for job in candidates)
+        all_nodes = set()
+        for job in candidates:
+            all_nodes.update(self._extract_nodes(job.nodelist))
+        resources = self.get_node_resources(sorted(all_nodes))
         
-        for job in jobs:
-            analysis = self.analyze_job(job)
-            if analysis:
-                misleading.append(analysis)
+        if resources or not all_nodes:
+            results = [self.analyze_job(job, resources) for job in candidates]
+        else:
+            # A single unknown node fails the whole batched scontrol call;
+            # fall back to one query per job, several at a time over the
+            # shared ssh master
+            with ThreadPoolExecutor(max_workers=min(8, len(candidates))) as executor:
+                results = list(executor.map(self.analyze_job, candidates))
         
-        return misleading
+        return [analysis for analysis in results if analysis]
 
 
 def main():
@@ -317,8 +378,8 @@ def main():
     
     for result in results:
         job = result['job']
-        print(f"Job {job['jobid']} ({job['user']}): {job['name']}")
-        print(f"  Status message: {job['reason']}")
+        print(f"Job {job.jobid} ({job.user}): {job.name}")
+        print(f"  Status message: {job.reason}")
         print(f"  Real reason: {result['real_reason']}")
         for detail in result['details']:
             print(f"    {detail}")
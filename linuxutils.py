@@ -9,48 +9,60 @@ from typing import *
 
 import os
 import sys
+import functools
 import pwd
 import grp
 import socket
 import platform
-from pathlib import Path
-from datetime import datetime
+import time
+import types
 
 
+@functools.lru_cache(maxsize=1)
 def get_username() -> str:
     """Get current username"""
     return os.getenv('USER') or os.getenv('USERNAME') or pwd.getpwuid(os.getuid()).pw_name
 
 
+@functools.lru_cache(maxsize=1)
 def get_hostname() -> str:
     """Get system hostname"""
     return socket.gethostname()
 
 
+@functools.lru_cache(maxsize=1)
 def get_fqdn() -> str:
     """Get fully qualified domain name"""
     return socket.getfqdn()
 
 
+@functools.lru_cache(maxsize=1)
 def get_uid() -> int:
     """Get user ID"""
     return os.getuid()
 
 
+@functools.lru_cache(maxsize=1)
 def get_gid() -> int:
     """Get group ID"""
     return os.getgid()
 
 
+@functools.lru_cache(maxsize=1)
+def _group_names() -> Tuple[str, ...]:
+    """Names of the user's groups, looked up once"""
+    return tuple(grp.getgrgid(gid).gr_name for gid in os.getgroups())
+
+
 def get_groups() -> list:
     """Get list of group names user belongs to"""
-    groups = os.getgroups()
-    return [grp.getgrgid(gid).gr_name for gid in groups]
+    return list(_group_names())
 
 
+@functools.lru_cache(maxsize=1)
 def get_home_dir() -> str:
     """Get user's home directory"""
-    return str(Path.home())
+    return os.path.expanduser('~')
 
 
 def get_temp_dir() -> str:
@@ -58,20 +70,22 @@ def get_temp_dir() -> str:
     return os.getenv('TMPDIR') or '/tmp'
 
 
+@functools.lru_cache(maxsize=1)
 def is_root() -> bool:
     """Check if running as root"""
     return os.getuid() == 0
 
 
-def get_system_info() -> dict:
-    """Get system information"""
-    return {
+@functools.lru_cache(maxsize=1)
+def _system_info() -> Mapping[str, Any]:
+    """System information, gathered once"""
+    return types.MappingProxyType({
         'hostname': get_hostname(),
         'fqdn': get_fqdn(),
         'username': get_username(),
         'uid': get_uid(),
         'gid': get_gid(),
-        'groups': get_groups(),
+        'groups': _group_names(),
         'home': get_home_dir(),
         'is_root': is_root(),
         'platform': platform.system(),
@@ -79,34 +93,82 @@ def get_system_info() -> dict:
         'version': platform.version(),
         'machine': platform.machine(),
         'processor': platform.processor(),
-    }
+    })
 
 
-def file_age(filepath: str) -> float:
+def get_system_info(refresh: bool = False) -> Mapping[str, Any]:
     """
-    Get age of file in seconds
+    Get system information
+    
+    Gathered once per process, so e.g. the FQDN (a DNS lookup) is resolved
+    at most once. The result is shared and read-only; groups is a tuple.
+    
+    Args:
+        refresh: Look everything up again instead of reusing the snapshot
+        
+    Returns:
+        Read-only mapping of system information
+    """
+    if refresh:
+        clear_caches()
+    return _system_info()
+
+
+def clear_caches():
+    """
+    Forget the cached user and system lookups
+    
+    Identity, hostname and group answers are looked up once per process,
+    as they rarely change while it runs; call this after e.g. dropping
+    privileges or changing the hostname.
+    """
+    for cached in (get_username, get_hostname, get_fqdn, get_uid, get_gid,
+                   _group_names, get_home_dir, is_root, _system_info):
+        cached.cache_clear()
+
+
+def stat_info(filepath: str) -> os.stat_result:
+    """
+    Get a file's stat result
+    
+    Files change, so this is not cached; to get both file_age and
+    file_size from one stat, take it here and pass it to each.
     
     Args:
         filepath: Path to file
         
+    Returns:
+        os.stat_result of the file
+    """
+    return os.stat(filepath)
+
+
+def file_age(filepath: Union[str, os.stat_result]) -> float:
+    """
+    Get age of file in seconds
+    
+    Args:
+        filepath: Path to file, or a stat result already taken for it
+        
     Returns:
         Age in seconds
     """
-    stat = Path(filepath).stat()
-    return datetime.now().timestamp() - stat.st_mtime
+    stat = filepath if isinstance(filepath, os.stat_result) else stat_info(str(filepath))
+    return time.time() - stat.st_mtime
 
 
-def file_size(filepath: str) -> int:
+def file_size(filepath: Union[str, os.stat_result]) -> int:
     """
     Get file size in bytes
     
     Args:
-        filepath: Path to file
+        filepath: Path to file, or a stat result already taken for it
         
     Returns:
         Size in bytes
     """
-    return Path(filepath).stat().st_size
+    stat = filepath if isinstance(filepath, os.stat_result) else stat_info(str(filepath))
+    return stat.st_size
 
 
 def disk_usage(path: str = '/') -> dict:
@@ -145,7 +207,7 @@ def make_executable(filepath: str):
 
 def ensure_dir(dirpath: str):
     """Ensure directory exists, create if needed"""
-    Path(dirpath).mkdir(parents=True, exist_ok=True)
+    os.makedirs(dirpath, exist_ok=True)
 
 
 if __name__ == '__main__':
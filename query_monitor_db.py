@@ -16,12 +16,142 @@ if sys.version_info < min_py:
     sys.exit(os.EX_SOFTWARE)
 
 import argparse
-import datetime
+import io
+import time
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 
 # Import database wrapper
 from urdb import URdb
 
+# Rows fetched and printed per chunk by the reports that can be long
+FETCH_CHUNK = 2000
+
+# Bucket width of the monitor's node_status_hourly rollup
+HOURLY_BUCKET_MS = 3_600_000
+
+# Tables and columns the queries below read that older databases lack;
+# cluster_node_monitor.py (or ClusterMonitorDB.init_schema) adds them
+REQUIRED_SCHEMA = {
+    'node_status': ('ts_ms', 'checks_covered'),
+    'node_events': ('ts_ms',),
+    'recovery_attempts': ('ts_ms',),
+    'node_status_latest': ('ts_ms',),
+    'node_status_hourly': ('bucket_ms',),
+}
+
+# Every query of the tool, registered with URdb.prepare() by name. The SQL
+# text is static (optional filters are ":cluster IS NULL OR ..."), so each
+# call hits the connection's statement cache.
+QUERIES = {
+    'list_nodes': """
+        SELECT DISTINCT cluster, node_name 
+        FROM node_status 
+        ORDER BY cluster, node_name
+    """,
+    # node_status_latest holds each cluster's newest snapshot, one row
+    # per node, kept current by the monitor
+    'current_status': """
+        SELECT cluster, node_name, slurm_state, is_available, timestamp
+        FROM node_status_latest
+        WHERE :cluster IS NULL OR cluster = :cluster
+        ORDER BY cluster, node_name
+    """,
+    'problem_history': """
+        SELECT timestamp, cluster, node_name, event_type, details, severity
+        FROM node_events
+        WHERE ts_ms > :cutoff
+        AND (:cluster IS NULL OR cluster = :cluster)
+        AND severity IN ('warning', 'error', 'critical')
+        ORDER BY ts_ms DESC
+    """,
+    # One row per (node, command); the most recently tried command first
+    'recovery_stats': """
+        SELECT cluster, node_name, command,
+               SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful,
+               COUNT(*) as attempts
+        FROM recovery_attempts
+        WHERE ts_ms > ?
+        GROUP BY cluster, node_name, command
+        ORDER BY cluster, node_name, MAX(timestamp) DESC
+    """,
+    # Answered from the covering idx_ns_cluster_node_tsms alone. Each row
+    # stands for checks_covered checks (the monitor skips unchanged
+    # snapshots), and is_available is 0/1, so 1 - is_available marks down
+    'downtime_report': """
+        SELECT cluster, node_name,
+               SUM(checks_covered) as checks,
+               SUM(checks_covered * (1 - is_available)) as down_checks
+        FROM node_status
+        WHERE ts_ms > ?
+        GROUP BY cluster, node_name
+        HAVING down_checks > 0
+        ORDER BY cluster, down_checks DESC
+    """,
+    # The same report for windows of a day or more: whole hours come from
+    # node_status_hourly, and only the partial first hour from raw checks
+    'downtime_report_hourly': """
+        SELECT cluster, node_name,
+               SUM(checks) as checks,
+               SUM(down_checks) as down_checks
+        FROM (
+            SELECT cluster, node_name, checks, down_checks
+            FROM node_status_hourly
+            WHERE bucket_ms >= :first_bucket
+            UNION ALL
+            SELECT cluster, node_name, checks_covered, checks_covered * (1 - is_available)
+            FROM node_status
+            WHERE ts_ms > :cutoff AND ts_ms < :first_bucket
+        )
+        GROUP BY cluster, node_name
+        HAVING SUM(down_checks) > 0
+        ORDER BY cluster, SUM(down_checks) DESC
+    """,
+    # A node's events and recovery attempts in one statement, each row
+    # tagged with its kind: (kind, timestamp, event_type | command,
+    # details | success, severity | output)
+    'node_detail': """
+        SELECT 'event' as kind, timestamp, event_type, details, severity, ts_ms
+        FROM node_events
+        WHERE cluster = :cluster AND node_name = :node AND ts_ms > :cutoff
+        UNION ALL
+        SELECT 'recovery', timestamp, command, success, output, ts_ms
+        FROM recovery_attempts
+        WHERE cluster = :cluster AND node_name = :node AND ts_ms > :cutoff
+        ORDER BY kind, ts_ms DESC
+    """,
+    # Latest status per cluster and its 24h issue count, in one query
+    'health_summary': """
+        WITH issues AS (
+            SELECT cluster, COUNT(*) as issue_count
+            FROM node_events
+            WHERE ts_ms > ?
+            AND severity IN ('warning', 'error', 'critical')
+            GROUP BY cluster
+        )
+        SELECT latest.cluster,
+               COUNT(*) as total_nodes,
+               SUM(CASE WHEN latest.is_available = 1 THEN 1 ELSE 0 END) as healthy_nodes,
+               MAX(latest.timestamp) as last_check,
+               COALESCE(issues.issue_count, 0) as issues
+        FROM node_status_latest latest
+        LEFT JOIN issues ON issues.cluster = latest.cluster
+        GROUP BY latest.cluster
+    """,
+}
+
+
+def cutoff_ms(seconds: float) -> int:
+    """Epoch milliseconds of the start of a look-back window, for ts_ms filters"""
+    return round((time.time() - seconds) * 1000)
+
+
+def fetch_rows(cursor) -> Iterator[tuple]:
+    """Yield a cursor's rows, fetched FETCH_CHUNK at a time"""
+    while rows := cursor.fetchmany(FETCH_CHUNK):
+        yield from rows
+
 
 class ClusterMonitorQuery:
     """Query cluster monitoring database"""
@@ -31,15 +161,41 @@ class ClusterMonitorQuery:
         self.db_path = db_path
         if not db_path.exists():
             raise FileNotFoundError(f"Database not found: {db_path}")
-        self.db = URdb(str(db_path))
+        self.db = URdb(str(db_path), read_only=True)
+        self.check_schema()
+        for name, query in QUERIES.items():
+            self.db.prepare(name, query)
+    
+    def check_schema(self):
+        """
+        Make sure the database has been migrated to the current schema
+        
+        The tool opens the database read-only, so it cannot add what is
+        missing itself.
+        
+        Raises:
+            RuntimeError: if a table or column the queries need is missing
+        """
+        missing = []
+        for table, columns in REQUIRED_SCHEMA.items():
+            present = self.db.get_columns(table)
+            if not present:
+                missing.append(table)
+            else:
+                missing.extend(f"{table}.{column}" for column in columns
+                               if column not in present)
+        
+        if missing:
+            self.db.close()
+            raise RuntimeError(
+                f"{self.db_path} predates the current schema (missing "
+                f"{', '.join(missing)}); run cluster_node_monitor.py once "
+                "to migrate it"
+            )
     
     def list_nodes(self):
         """List all monitored nodes by cluster"""
-        result = self.db.execute("""
-            SELECT DISTINCT cluster, node_name 
-            FROM node_status 
-            ORDER BY cluster, node_name
-        """).fetchall()
+        result = self.db.execute_named('list_nodes').fetchall()
         
         print("\n" + "="*60)
         print("NODES BY CLUSTER")
@@ -53,115 +209,73 @@ class ClusterMonitorQuery:
                 current_cluster = cluster
             print(f"  - {node}")
     
+    def close(self):
+        """Close the database connection"""
+        self.db.close()
+    
     def current_status(self, cluster: Optional[str] = None):
         """Show current status of all nodes"""
-        # Fixed query: get max timestamp PER CLUSTER
-        if cluster:
-            query = """
-                SELECT ns1.cluster, ns1.node_name, ns1.slurm_state, ns1.is_available, ns1.timestamp
-                FROM node_status ns1
-                INNER JOIN (
-                    SELECT cluster, MAX(timestamp) as max_ts
-                    FROM node_status
-                    WHERE cluster = ?
-                    GROUP BY cluster
-                ) ns2 ON ns1.cluster = ns2.cluster AND ns1.timestamp = ns2.max_ts
-                ORDER BY ns1.cluster, ns1.node_name
-            """
-            result = self.db.execute(query, (cluster,)).fetchall()
-        else:
-            query = """
-                SELECT ns1.cluster, ns1.node_name, ns1.slurm_state, ns1.is_available, ns1.timestamp
-                FROM node_status ns1
-                INNER JOIN (
-                    SELECT cluster, MAX(timestamp) as max_ts
-                    FROM node_status
-                    GROUP BY cluster
-                ) ns2 ON ns1.cluster = ns2.cluster AND ns1.timestamp = ns2.max_ts
-                ORDER BY ns1.cluster, ns1.node_name
-            """
-            result = self.db.execute(query).fetchall()
+        cursor = self.db.execute_named('current_status', {'cluster': cluster})
         
         print("\n" + "="*60)
         print("CURRENT NODE STATUS")
         print("="*60)
         
-        current_cluster = None
-        cluster_stats = {}
-        
-        for row in result:
-            cluster_name, node, state, is_available, timestamp = row
+        # One pass over the streamed rows, written out a cluster at a time
+        buf = io.StringIO()
+        for i, (cluster_name, group) in enumerate(groupby(fetch_rows(cursor), itemgetter(0))):
+            rows = list(group)
+            healthy = sum(1 for row in rows if row[3])
             
-            if cluster_name != current_cluster:
-                if current_cluster:
-                    stats = cluster_stats[current_cluster]
-                    print(f"  Summary: {stats['healthy']} healthy, {stats['problem']} problem")
-                    print()
-                
-                print(f"{cluster_name} (as of {timestamp}):")
-                current_cluster = cluster_name
-                cluster_stats[cluster_name] = {'healthy': 0, 'problem': 0}
+            if i:
+                buf.write("\n")
+            buf.write(f"{cluster_name} (as of {rows[0][4]}):\n")
+            buf.writelines(
+                f"  {'[OK]' if is_available else '[X]'} {node:12s}  {state}\n"
+                for _, node, state, is_available, _ in rows
+            )
+            buf.write(f"  Summary: {healthy} healthy, {len(rows) - healthy} problem\n")
             
-            status_mark = "[OK]" if is_available else "[X]"
-            print(f"  {status_mark} {node:12s}  {state}")
-            
-            if is_available:
-                cluster_stats[cluster_name]['healthy'] += 1
-            else:
-                cluster_stats[cluster_name]['problem'] += 1
-        
-        if current_cluster:
-            stats = cluster_stats[current_cluster]
-            print(f"  Summary: {stats['healthy']} healthy, {stats['problem']} problem")
+            sys.stdout.write(buf.getvalue())
+            buf.seek(0)
+            buf.truncate()
     
     def problem_history(self, days: int = 7, cluster: Optional[str] = None):
         """Show problem history"""
-        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        cutoff = cutoff_ms(days * 86400)
         
-        if cluster:
-            where = "AND cluster = ?"
-            params = (cutoff, cluster)
-        else:
-            where = ""
-            params = (cutoff,)
-        
-        result = self.db.execute(f"""
-            SELECT timestamp, cluster, node_name, event_type, details, severity
-            FROM node_events
-            WHERE timestamp > ? {where}
-            AND severity IN ('warning', 'error', 'critical')
-            ORDER BY timestamp DESC
-        """, params).fetchall()
+        cursor = self.db.execute_named(
+            'problem_history', {'cutoff': cutoff, 'cluster': cluster}
+        )
         
         print("\n" + "="*60)
         print(f"PROBLEM HISTORY - Last {days} days")
         print("="*60)
         
-        if not result:
-            print("No problems detected!")
-            return
+        found = False
+        buf = io.StringIO()
+        while rows := cursor.fetchmany(FETCH_CHUNK):
+            found = True
+            for timestamp, cluster, node, event_type, details, severity in rows:
+                buf.write(
+                    f"\n{timestamp} [{severity.upper()}]\n"
+                    f"  Cluster: {cluster}\n"
+                    f"  Node: {node}\n"
+                    f"  Event: {event_type}\n"
+                    f"  Details: {details}\n"
+                )
+            sys.stdout.write(buf.getvalue())
+            buf.seek(0)
+            buf.truncate()
         
-        for row in result:
-            timestamp, cluster, node, event_type, details, severity = row
-            print(f"\n{timestamp} [{severity.upper()}]")
-            print(f"  Cluster: {cluster}")
-            print(f"  Node: {node}")
-            print(f"  Event: {event_type}")
-            print(f"  Details: {details}")
+        if not found:
+            print("No problems detected!")
     
     def recovery_stats(self, days: int = 7):
         """Show recovery attempt statistics"""
-        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        cutoff = cutoff_ms(days * 86400)
         
-        result = self.db.execute("""
-            SELECT cluster, node_name, recovery_action, success, 
-                   COUNT(*) as attempts,
-                   SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful
-            FROM recovery_attempts
-            WHERE timestamp > ?
-            GROUP BY cluster, node_name, recovery_action, success
-            ORDER BY cluster, node_name, timestamp DESC
-        """, (cutoff,)).fetchall()
+        result = self.db.execute_named('recovery_stats', (cutoff,)).fetchall()
         
         print("\n" + "="*60)
         print(f"RECOVERY STATISTICS - Last {days} days")
@@ -171,33 +285,30 @@ class ClusterMonitorQuery:
             print("No recovery attempts in this period")
             return
         
-        current_cluster = None
-        for row in result:
-            cluster, node, action, success, attempts, successful = row
-            
-            if cluster != current_cluster:
-                if current_cluster:
-                    print()
-                print(f"\n{cluster}:")
-                current_cluster = cluster
-            
-            status = "SUCCESS" if success else "FAILED"
-            print(f"  {node}: {action} - {status} ({successful}/{attempts} attempts)")
+        buf = io.StringIO()
+        for i, (cluster, group) in enumerate(groupby(result, itemgetter(0))):
+            buf.write(f"\n\n{cluster}:\n" if i else f"\n{cluster}:\n")
+            for _, node, action, successful, attempts in group:
+                if successful == attempts:
+                    status = "SUCCESS"
+                elif successful:
+                    status = "PARTIAL"
+                else:
+                    status = "FAILED"
+                buf.write(f"  {node}: {action} - {status} ({successful}/{attempts} attempts)\n")
+        sys.stdout.write(buf.getvalue())
     
     def downtime_report(self, days: int = 7):
         """Show downtime statistics"""
-        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        cutoff = cutoff_ms(days * 86400)
         
-        result = self.db.execute("""
-            SELECT cluster, node_name,
-                   COUNT(*) as checks,
-                   SUM(CASE WHEN is_available = 0 THEN 1 ELSE 0 END) as down_checks
-            FROM node_status
-            WHERE timestamp > ?
-            GROUP BY cluster, node_name
-            HAVING down_checks > 0
-            ORDER BY cluster, down_checks DESC
-        """, (cutoff,)).fetchall()
+        if days >= 1:
+            first_bucket = (cutoff // HOURLY_BUCKET_MS + 1) * HOURLY_BUCKET_MS
+            cursor = self.db.execute_named(
+                'downtime_report_hourly', {'cutoff': cutoff, 'first_bucket': first_bucket}
+            )
+        else:
+            cursor = self.db.execute_named('downtime_report', (cutoff,))
         
         print("\n" + "="*60)
         print(f"DOWNTIME REPORT - Last {days} days")
@@ -205,58 +316,50 @@ class ClusterMonitorQuery:
         print("Note: Downtime % is approximate based on monitoring frequency")
         print("-"*60)
         
-        if not result:
-            print("No downtime detected!")
-            return
+        found = False
+        buf = io.StringIO()
+        for cluster, group in groupby(fetch_rows(cursor), itemgetter(0)):
+            buf.write(f"\n\n{cluster}:\n" if found else f"\n{cluster}:\n")
+            found = True
+            buf.writelines(
+                f"  {node}: {down_checks}/{checks} checks down ({down_checks / checks * 100:.1f}%)\n"
+                for _, node, checks, down_checks in group
+            )
+            sys.stdout.write(buf.getvalue())
+            buf.seek(0)
+            buf.truncate()
         
-        current_cluster = None
-        for row in result:
-            cluster, node, checks, down_checks = row
-            downtime_pct = (down_checks / checks) * 100
-            
-            if cluster != current_cluster:
-                if current_cluster:
-                    print()
-                print(f"\n{cluster}:")
-                current_cluster = cluster
-            
-            print(f"  {node}: {down_checks}/{checks} checks down ({downtime_pct:.1f}%)")
+        if not found:
+            print("No downtime detected!")
     
     
     def node_detail(self, cluster: str, node: str, days: int = 7):
         """Show detailed information for a specific node"""
-        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        cutoff = cutoff_ms(days * 86400)
         
         print("\n" + "="*60)
         print(f"NODE DETAIL: {cluster}:{node}")
         print("="*60)
         
-        # Recent events
-        events = self.db.execute("""
-            SELECT timestamp, event_type, details, severity
-            FROM node_events
-            WHERE cluster = ? AND node_name = ? AND timestamp > ?
-            ORDER BY timestamp DESC
-        """, (cluster, node, cutoff)).fetchall()
+        rows = self.db.execute_named(
+            'node_detail', {'cluster': cluster, 'node': node, 'cutoff': cutoff}
+        ).fetchall()
+        sections = {kind: list(group) for kind, group in groupby(rows, itemgetter(0))}
         
+        # Recent events
+        events = sections.get('event')
         if events:
             print(f"\nRecent events (last {days} days):")
-            for timestamp, event_type, details, severity in events:
+            for _, timestamp, event_type, details, severity, _ in events:
                 print(f"  {timestamp} [{severity}] {event_type}: {details}")
         else:
             print(f"\nNo events in the last {days} days")
         
         # Recovery attempts
-        recoveries = self.db.execute("""
-            SELECT timestamp, command, success, output
-            FROM recovery_attempts
-            WHERE cluster = ? AND node_name = ? AND timestamp > ?
-            ORDER BY timestamp DESC
-        """, (cluster, node, cutoff)).fetchall()
-        
+        recoveries = sections.get('recovery')
         if recoveries:
             print(f"\nRecovery attempts (last {days} days):")
-            for timestamp, command, success, output in recoveries:
+            for _, timestamp, command, success, output, _ in recoveries:
                 status = "SUCCESS" if success else f"FAILED: {output}"
                 print(f"  {timestamp} {command}: {status}")
         else:
@@ -264,26 +367,15 @@ class ClusterMonitorQuery:
 
     def health_summary(self):
         """Show overall health summary"""
-        # Get latest status per cluster
-        result = self.db.execute("""
-            SELECT ns1.cluster,
-                   COUNT(*) as total_nodes,
-                   SUM(CASE WHEN ns1.is_available = 1 THEN 1 ELSE 0 END) as healthy_nodes,
-                   MAX(ns1.timestamp) as last_check
-            FROM node_status ns1
-            INNER JOIN (
-                SELECT cluster, MAX(timestamp) as max_ts
-                FROM node_status
-                GROUP BY cluster
-            ) ns2 ON ns1.cluster = ns2.cluster AND ns1.timestamp = ns2.max_ts
-            GROUP BY ns1.cluster
-        """).fetchall()
+        cutoff_24h = cutoff_ms(86400)
+        
+        result = self.db.execute_named('health_summary', (cutoff_24h,)).fetchall()
         
         print("\n" + "="*60)
         print("CLUSTER HEALTH SUMMARY")
         print("="*60)
         
-        for cluster, total, healthy, last_check in result:
+        for cluster, total, healthy, last_check, issues in result:
             problem = total - healthy
             health_pct = (healthy / total * 100) if total > 0 else 0
             
@@ -291,14 +383,6 @@ class ClusterMonitorQuery:
             print(f"  Total nodes:    {total}")
             print(f"  Healthy:        {healthy} ({health_pct:.1f}%)")
             print(f"  Problem:        {problem}")
-            
-            # Get 24h issue count
-            cutoff_24h = (datetime.datetime.now() - datetime.timedelta(hours=24)).isoformat()
-            issues = self.db.execute("""
-                SELECT COUNT(*) FROM node_events
-                WHERE cluster = ? AND timestamp > ?
-                AND severity IN ('warning', 'error', 'critical')
-            """, (cluster, cutoff_24h)).fetchone()[0]
             print(f"  Issues (24h):   {issues}")
 
 
@@ -339,6 +423,7 @@ def main():
     
     args = parser.parse_args()
     
+    query = None
     try:
         query = ClusterMonitorQuery(args.db)
         
@@ -361,10 +446,19 @@ def main():
             parser.print_help()
             return os.EX_USAGE
     
+    except RuntimeError as e:
+        # Database not migrated to the current schema
+        print(f"ERROR: {e}", file=sys.stderr)
+        return os.EX_DATAERR
+    
     except Exception as e:
         print(f"ERROR: {e}", file=sys.stderr)
         return os.EX_SOFTWARE
     
+    finally:
+        if query:
+            query.close()
+    
     return os.EX_OK
 
 
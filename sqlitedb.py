@@ -15,7 +15,12 @@ from datetime import datetime
 
 
 class SQLiteDB:
-    """Extended SQLite database operations"""
+    """
+    Extended SQLite database operations
+    
+    The connection is opened on first use. Call close(), or use the
+    object as a context manager, when done with it.
+    """
     
     def __init__(self, db_path: str):
         """
@@ -25,9 +30,23 @@ class SQLiteDB:
             db_path: Path to SQLite database file
         """
         self.db_path = str(db_path)
-        self.connection = sqlite3.connect(self.db_path)
-        self.connection.row_factory = sqlite3.Row
-        self.cursor = self.connection.cursor()
+        self._connection = None
+        self._cursor = None
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Database connection, opened on first use"""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_path)
+            self._connection.row_factory = sqlite3.Row
+        return self._connection
+    
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        """Cursor of the connection, created on first use"""
+        if self._cursor is None:
+            self._cursor = self.connection.cursor()
+        return self._cursor
     
     def backup(self, backup_path: str) -> bool:
         """
@@ -64,24 +83,36 @@ class SQLiteDB:
     
     def get_table_info(self, table_name: str) -> list:
         """Get detailed table information"""
-        self.cursor.execute(f"PRAGMA table_info({table_name})")
+        self.cursor.execute("SELECT * FROM pragma_table_info(?)", (table_name,))
         return self.cursor.fetchall()
     
     def get_indexes(self, table_name: str = None) -> list:
         """Get list of indexes"""
         if table_name:
-            query = f"SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='{table_name}'"
+            self.cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=?",
+                (table_name,)
+            )
         else:
-            query = "SELECT name FROM sqlite_master WHERE type='index'"
-        self.cursor.execute(query)
+            self.cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
         return [row[0] for row in self.cursor.fetchall()]
     
     def close(self):
         """Close database connection"""
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
+        if self._cursor:
+            self._cursor.close()
+            self._cursor = None
+        if self._connection:
+            self._connection.close()
+            self._connection = None
+    
+    def __enter__(self):
+        """Context manager entry"""
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit"""
+        self.close()
 
 
 if __name__ == '__main__':
@@ -9,29 +9,123 @@ from typing import *
 
 import os
 import sys
+import collections
+import contextlib
+import logging
 import sqlite3
+import time
 from pathlib import Path
 
+# Applied to every connection: memory-mapped reads, a 64 MB page cache and
+# in-memory temp tables
+READ_PRAGMAS = (
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+)
+
+# sqlite3 keeps this many compiled statements per connection, keyed by
+# their SQL text
+CACHED_STATEMENTS = 256
+
+# Applied to writable connections: with WAL, readers and the writer do not
+# block each other, and NORMAL only syncs at checkpoints
+WRITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+)
+
+# With SQLITE_TRACE set in the environment, every statement is logged at
+# DEBUG and the statements with the most execute() time are printed to
+# stderr when the connection closes
+TRACE_TOP_N = 10
+
+logger = logging.getLogger(__name__)
+
+
+class _FetchedRows:
+    """
+    Rows of an INSERT/UPDATE/DELETE ... RETURNING, read off its cursor so
+    the write can be committed; answers the cursor calls callers make
+    """
+    
+    def __init__(self, cursor: sqlite3.Cursor):
+        self.description = cursor.description
+        self.rows = cursor.fetchall()
+        self.lastrowid = cursor.lastrowid
+        self.rowcount = cursor.rowcount
+        self._pos = 0
+    
+    def fetchone(self):
+        """Fetch the next row, or None"""
+        if self._pos >= len(self.rows):
+            return None
+        self._pos += 1
+        return self.rows[self._pos - 1]
+    
+    def fetchmany(self, size: int = 1) -> list:
+        """Fetch up to size rows"""
+        rows = self.rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+    
+    def fetchall(self) -> list:
+        """Fetch the remaining rows"""
+        rows = self.rows[self._pos:]
+        self._pos = len(self.rows)
+        return rows
+    
+    def __iter__(self):
+        return iter(self.fetchall())
+
 
 class URdb:
-    """Universal Database wrapper for SQLite operations"""
+    """
+    Universal Database wrapper for SQLite operations
     
-    def __init__(self, db_path: str):
+    The connection is opened on first use. Call close(), or use the
+    object as a context manager, when done with it.
+    """
+    
+    def __init__(self, db_path: str, read_only: bool = False, **connect_kwargs):
         """
         Initialize database connection
         
         Args:
             db_path: Path to SQLite database file
+            read_only: Open the existing file with mode=ro, for tools that
+                only query it
+            **connect_kwargs: Additional arguments passed to sqlite3.connect
         """
         self.db_path = str(db_path)
+        self.read_only = read_only
+        self.connect_kwargs = {'cached_statements': CACHED_STATEMENTS, **connect_kwargs}
         self.connection = None
         self.cursor = None
-        self._connect()
+        self._result = None
+        self._in_tx = False
+        self._stmts: Dict[str, str] = {}
+        self._trace_ns: Optional[collections.Counter] = None
+        self._trace_calls: Optional[collections.Counter] = None
     
     def _connect(self):
         """Establish database connection"""
         try:
-            self.connection = sqlite3.connect(self.db_path)
+            if self.read_only:
+                self.connection = sqlite3.connect(
+                    f"{Path(self.db_path).resolve().as_uri()}?mode=ro",
+                    uri=True, **self.connect_kwargs
+                )
+                pragmas = READ_PRAGMAS
+            else:
+                self.connection = sqlite3.connect(self.db_path, **self.connect_kwargs)
+                pragmas = WRITE_PRAGMAS + READ_PRAGMAS
+            for pragma in pragmas:
+                self.connection.execute(pragma)
+            if os.environ.get('SQLITE_TRACE'):
+                self._trace_ns = collections.Counter()
+                self._trace_calls = collections.Counter()
+                self.connection.set_trace_callback(self._trace)
             self.connection.row_factory = sqlite3.Row  # Enable column access by name
             self.cursor = self.connection.cursor()
         except sqlite3.Error as e:
@@ -46,24 +140,58 @@ class URdb:
             parameters: Query parameters (optional)
             
         Returns:
-            Cursor object for SELECT queries, self for others
+            Cursor object (for a write with RETURNING outside of
+            transaction(), an object holding its already fetched rows)
         """
+        if self.connection is None:
+            self._connect()
         try:
-            if parameters:
-                self.cursor.execute(query, parameters)
-            else:
-                self.cursor.execute(query)
+            start = time.perf_counter_ns() if self._trace_ns is not None else 0
+            self.cursor.execute(query, parameters or ())
+            if start:
+                self._timed(query, start)
+            self._result = self.cursor
             
-            # Auto-commit for non-SELECT queries
-            if not query.strip().upper().startswith('SELECT'):
+            # Auto-commit writes outside of transaction(): sqlite3 opens a
+            # transaction only for INSERT/UPDATE/DELETE/REPLACE, however
+            # the statement is spelled. A write with RETURNING cannot be
+            # committed while its rows are pending, so they are read first.
+            if not self._in_tx and self.connection.in_transaction:
+                if self.cursor.description is not None:
+                    self._result = _FetchedRows(self.cursor)
                 self.connection.commit()
             
-            return self.cursor
+            return self._result
         
         except sqlite3.Error as e:
-            self.connection.rollback()
+            if not self._in_tx:
+                self.connection.rollback()
             raise Exception(f"Query execution error: {e}\nQuery: {query}")
     
+    def prepare(self, name: str, query: str) -> None:
+        """
+        Register a statement under a name for execute_named()
+        
+        Args:
+            name: Logical name of the statement
+            query: SQL query string; keep it static, so every call hits
+                the connection's statement cache
+        """
+        self._stmts[name] = query
+    
+    def execute_named(self, name: str, parameters: Union[tuple, dict] = None):
+        """
+        Execute a statement registered with prepare()
+        
+        Args:
+            name: Logical name of the statement
+            parameters: Query parameters (optional)
+            
+        Returns:
+            Cursor object
+        """
+        return self.execute(self._stmts[name], parameters)
+    
     def executemany(self, query: str, parameters: list):
         """
         Execute a SQL query multiple times with different parameters
@@ -75,42 +203,122 @@ class URdb:
         Returns:
             self
         """
+        if self.connection is None:
+            self._connect()
         try:
+            start = time.perf_counter_ns() if self._trace_ns is not None else 0
             self.cursor.executemany(query, parameters)
-            self.connection.commit()
+            if start:
+                self._timed(query, start)
+            if not self._in_tx:
+                self.connection.commit()
             return self
         except sqlite3.Error as e:
-            self.connection.rollback()
+            if not self._in_tx:
+                self.connection.rollback()
             raise Exception(f"Query execution error: {e}")
     
     def fetchone(self):
         """Fetch one row from last query"""
-        return self.cursor.fetchone()
+        return self._result.fetchone()
     
     def fetchall(self):
         """Fetch all rows from last query"""
-        return self.cursor.fetchall()
+        return self._result.fetchall()
     
     def fetchmany(self, size: int = None):
         """Fetch multiple rows from last query"""
         if size:
-            return self.cursor.fetchmany(size)
-        return self.cursor.fetchmany()
+            return self._result.fetchmany(size)
+        return self._result.fetchmany()
+    
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Run a block of statements as a single BEGIN IMMEDIATE ... COMMIT
+        
+        execute() and executemany() do not commit inside the block, so a
+        loop of inserts costs one commit instead of one per statement.
+        Nested calls join the outer transaction.
+        
+        Yields:
+            self
+        """
+        if self._in_tx:
+            yield self
+            return
+        
+        if self.connection is None:
+            self._connect()
+        try:
+            self.connection.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            raise Exception(f"Transaction error: {e}")
+        self._in_tx = True
+        try:
+            yield self
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            raise Exception(f"Transaction error: {e}")
+        except BaseException:
+            self.connection.rollback()
+            raise
+        else:
+            self.connection.commit()
+        finally:
+            self._in_tx = False
     
     def commit(self):
         """Commit current transaction"""
-        self.connection.commit()
+        if self.connection:
+            self.connection.commit()
     
     def rollback(self):
         """Rollback current transaction"""
-        self.connection.rollback()
+        if self.connection:
+            self.connection.rollback()
+    
+    def _trace(self, statement: str) -> None:
+        """Trace callback: log each statement SQLite runs (SQLITE_TRACE)"""
+        logger.debug("SQL: %s", statement)
+    
+    def _timed(self, query: str, start: int) -> None:
+        """Add an execute() call's elapsed time to the trace totals"""
+        self._trace_ns[query] += time.perf_counter_ns() - start
+        self._trace_calls[query] += 1
+    
+    def trace_report(self, n: int = TRACE_TOP_N) -> str:
+        """
+        Summarize the statements with the most execute() time
+        
+        Args:
+            n: Number of statements to list
+            
+        Returns:
+            One line per statement: total ms, call count and the SQL
+        """
+        if not self._trace_ns:
+            return ""
+        lines = [f"SQL time by statement (top {n}):"]
+        for query, ns in self._trace_ns.most_common(n):
+            lines.append(
+                f"{ns / 1e6:10.3f} ms {self._trace_calls[query]:6d}x  "
+                f"{' '.join(query.split())[:100]}"
+            )
+        return "\n".join(lines)
     
     def close(self):
         """Close database connection"""
+        if self._trace_ns:
+            print(self.trace_report(), file=sys.stderr)
+            self._trace_ns.clear()
         if self.cursor:
             self.cursor.close()
+            self.cursor = None
+            self._result = None
         if self.connection:
             self.connection.close()
+            self.connection = None
     
     def __enter__(self):
         """Context manager entry"""
@@ -124,19 +332,15 @@ class URdb:
             self.commit()
         self.close()
     
-    def __del__(self):
-        """Destructor"""
-        self.close()
-    
     @property
     def lastrowid(self):
         """Get last inserted row ID"""
-        return self.cursor.lastrowid
+        return self._result.lastrowid
     
     @property
     def rowcount(self):
         """Get number of affected rows"""
-        return self.cursor.rowcount
+        return self._result.rowcount
     
     def table_exists(self, table_name: str) -> bool:
         """Check if a table exists"""
@@ -155,8 +359,10 @@ class URdb:
     
     def get_columns(self, table_name: str) -> list:
         """Get list of columns for a table"""
-        result = self.execute(f"PRAGMA table_info({table_name})").fetchall()
-        return [row[1] for row in result]
+        result = self.execute(
+            "SELECT name FROM pragma_table_info(?)", (table_name,)
+        ).fetchall()
+        return [row[0] for row in result]
 
 
 if __name__ == '__main__':
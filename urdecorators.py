@@ -10,20 +10,43 @@ from typing import *
 import os
 import sys
 import time
+import logging
+import threading
 import functools
-from datetime import datetime
+import weakref
 
 
-def timer(func):
-    """Decorator to time function execution"""
+# timer() logs calls that take longer than this (nanoseconds)
+TIMER_THRESHOLD_NS = 1_000_000
+
+
+def timer(func: Callable = None, *, threshold_ns: int = None):
+    """
+    Decorator to time function execution
+    
+    Uses the monotonic perf_counter_ns() and logs at DEBUG level only calls
+    slower than the threshold, so fast calls cost two clock reads and no I/O.
+    Usable as @timer or @timer(threshold_ns=...).
+    
+    Args:
+        func: Function to time
+        threshold_ns: Minimum duration to log (default: TIMER_THRESHOLD_NS)
+    """
+    if func is None:
+        return functools.partial(timer, threshold_ns=threshold_ns)
+    
+    logger = logging.getLogger(__name__)
+    limit = TIMER_THRESHOLD_NS if threshold_ns is None else threshold_ns
+    
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        elapsed = end_time - start_time
-        print(f"{func.__name__} took {elapsed:.4f} seconds")
-        return result
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed_ns = time.perf_counter_ns() - start
+            if elapsed_ns > limit:
+                logger.debug("%s took %.3f ms", func.__name__, elapsed_ns / 1e6)
     return wrapper
 
 
@@ -65,44 +88,102 @@ def deprecated(message: str = "This function is deprecated"):
     return decorator
 
 
-def memoize(func):
-    """Decorator to cache function results"""
-    cache = {}
+def memoize(func: Callable = None, *, maxsize: Optional[int] = 1024):
+    """
+    Decorator to cache function results
+    
+    A bounded LRU (functools.lru_cache), so keyword arguments are part of
+    the key and a long-running process does not grow the cache without
+    limit. Usable as @memoize or @memoize(maxsize=...). For methods use
+    memoize_method, which does not keep instances alive.
+    
+    Args:
+        func: Function to cache
+        maxsize: Maximum number of cached results (None: unbounded)
+    """
+    if func is None:
+        return functools.partial(memoize, maxsize=maxsize)
+    return functools.lru_cache(maxsize=maxsize)(func)
+
+
+def memoize_method(func: Callable = None, *, maxsize: Optional[int] = 1024):
+    """
+    Decorator to cache method results per instance
+    
+    Each instance gets its own LRU, held in a WeakKeyDictionary and
+    calling the method through a weak reference, so the cache is dropped
+    together with the instance.
+    
+    Args:
+        func: Method to cache
+        maxsize: Maximum number of cached results per instance
+    """
+    if func is None:
+        return functools.partial(memoize_method, maxsize=maxsize)
+    
+    caches = weakref.WeakKeyDictionary()
     
     @functools.wraps(func)
-    def wrapper(*args):
-        if args not in cache:
-            cache[args] = func(*args)
-        return cache[args]
+    def wrapper(self, *args, **kwargs):
+        try:
+            cached = caches[self]
+        except KeyError:
+            ref = weakref.ref(self)
+            cached = caches[self] = functools.lru_cache(maxsize=maxsize)(
+                lambda *args, **kwargs: func(ref(), *args, **kwargs)
+            )
+        return cached(*args, **kwargs)
     return wrapper
 
 
 def singleton(cls):
-    """Decorator to make a class a singleton"""
+    """
+    Decorator to make a class a singleton
+    
+    Construction is serialized by a lock, so threads racing on the first
+    call share one instance; later calls return it without locking.
+    """
     instances = {}
+    lock = threading.Lock()
     
     @functools.wraps(cls)
     def wrapper(*args, **kwargs):
-        if cls not in instances:
-            instances[cls] = cls(*args, **kwargs)
-        return instances[cls]
+        try:
+            return instances[cls]
+        except KeyError:
+            pass
+        with lock:
+            if cls not in instances:
+                instances[cls] = cls(*args, **kwargs)
+            return instances[cls]
     return wrapper
 
 
 def log_calls(func):
-    """Decorator to log function calls"""
+    """
+    Decorator to log function calls
+    
+    Logs at DEBUG level; when that is disabled the arguments and result
+    are not formatted at all.
+    """
+    logger = logging.getLogger(__name__)
+    
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        timestamp = datetime.now().isoformat()
-        print(f"[{timestamp}] Calling {func.__name__} with args={args}, kwargs={kwargs}")
+        if not logger.isEnabledFor(logging.DEBUG):
+            return func(*args, **kwargs)
+        logger.debug("Calling %s with args=%r, kwargs=%r", func.__name__, args, kwargs)
         result = func(*args, **kwargs)
-        print(f"[{timestamp}] {func.__name__} returned {result}")
+        logger.debug("%s returned %r", func.__name__, result)
         return result
     return wrapper
 
 
 if __name__ == '__main__':
     # Test the decorators
+    from urlogger import setup_logger
+    setup_logger(__name__, level=logging.DEBUG)
+    
     @timer
     def slow_function():
         time.sleep(0.1)
@@ -10,10 +10,20 @@ from typing import *
 import os
 import sys
 import logging
+import logging.handlers
 from pathlib import Path
 from datetime import datetime
 
 
+# Settings (level, log_file, format_string) of the loggers setup_logger()
+# has already configured, keyed by logger name
+_configured: Dict[str, Tuple[int, Optional[str], Optional[str]]] = {}
+
+# Size at which a log file is rotated, and how many old files are kept
+LOG_MAX_BYTES = 10_000_000
+LOG_BACKUP_COUNT = 5
+
+
 def setup_logger(name: str = None,
                 log_file: str = None,
                 level: int = logging.INFO,
@@ -21,6 +31,11 @@ def setup_logger(name: str = None,
     """
     Setup a logger with console and file handlers
     
+    Handlers are attached once per logger name; later calls with the same
+    settings return the configured logger without rebuilding them, while
+    calls with a different level, log_file or format replace them. The
+    log file is rotated at LOG_MAX_BYTES.
+    
     Args:
         name: Logger name (default: __name__)
         log_file: Log file path (optional)
@@ -34,9 +49,15 @@ def setup_logger(name: str = None,
         name = __name__
     
     logger = logging.getLogger(name)
+    settings = (level, log_file, format_string)
+    if _configured.get(name) == settings:
+        return logger
+    
     logger.setLevel(level)
     
     # Remove existing handlers
+    for handler in logger.handlers:
+        handler.close()
     logger.handlers = []
     
     # Default format
@@ -57,11 +78,14 @@ def setup_logger(name: str = None,
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
         
-        file_handler = logging.FileHandler(log_file)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+        )
         file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
         logger.addHandler(file_handler)
     
+    _configured[name] = settings
     return logger
 
 